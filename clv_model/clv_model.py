@@ -3,6 +3,7 @@ from dataclasses import dataclass
 from numbers import Real
 from typing import Any, Dict, Optional
 
+import numpy
 import pandas
 
 from .transactions_model.transactions_model import TransactionsModel
@@ -89,6 +90,18 @@ class CLVModel:
     ) -> pandas.DataFrame:
         transactions = self.transactions_model.predict(data, periods)
         values = self.value_model.predict(data)
+        # predictions are combined by position, which relies on them
+        # being in the order of the rows of data
+        ids = data.id.to_numpy()
+        for name, predictions in [
+            ('transactions', transactions),
+            ('value', values),
+        ]:
+            if not numpy.array_equal(predictions.id.to_numpy(), ids):
+                raise ValueError(
+                    f'Predictions of the {name} model are not in the order '
+                    'of the rows of data.'
+                )
 
         alpha = 1 / (1 + discount_rate)
         discounted_time = (
@@ -96,21 +109,16 @@ class CLVModel:
             else ((1 - alpha**periods) / (1 - alpha))
         )
 
-        return (
-            transactions
-            .merge(values, on='id')
-            .merge(data[['id', 'T']], on='id')
-            .assign(
-                transaction_rate=lambda df: df.transactions / periods,
-                base_discount_factor=lambda df: alpha ** df['T'],
-                clv=lambda df: (
-                    df.transaction_rate
-                    * df.value
-                    * df.base_discount_factor
+        return pandas.DataFrame(
+            data={
+                'id': transactions.id,
+                'clv': (
+                    transactions.transactions / periods
+                    * values.value.to_numpy()
+                    * alpha ** data['T'].to_numpy()
                     * discounted_time
                 )
-            )
-            [['id', 'clv']]
+            }
         )
 
     @staticmethod
@@ -119,17 +127,15 @@ class CLVModel:
         discount_rate: Real
     ) -> pandas.DataFrame:
         alpha = 1 / (1 + discount_rate)
-        return (
-            rfm_df
-            .assign(
-                transaction_rate=lambda df: df.frequency / df['T'],
-                discounted_time=lambda df:
-                ((1 - alpha**df['T']) / (1 - alpha)).fillna(df['T']),
-                clv=lambda df: (
-                    df.transaction_rate
-                    * df.value
-                    * df.discounted_time
-                )
-            )
-            [['id', 'clv']]
+        observation_period = rfm_df['T']
+        transaction_rate = rfm_df.frequency / observation_period
+        discounted_time = (
+            (1 - alpha**observation_period) / (1 - alpha)
+        ).fillna(observation_period)
+
+        return pandas.DataFrame(
+            data={
+                'id': rfm_df.id,
+                'clv': transaction_rate * rfm_df.value * discounted_time
+            }
         )
@@ -1,8 +1,20 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
 import typing
 
+import numpy
 import pandas
 
-__all__ = ('rfm',)
+__all__ = (
+    'compact_rfm',
+    'rfm',
+    'rfm_calibration_holdout',
+    'rfm_from_chunks',
+    'rfm_rollup',
+)
+
+ENGINES = ('numpy', 'pandas')
 
 
 def rfm(
@@ -12,6 +24,9 @@ def rfm(
     value_col: typing.Optional[str] = None,
     period: str = 'D',
     observation_period_end: typing.Optional[typing.Any] = None,
+    engine: str = 'numpy',
+    n_jobs: int = 1,
+    compact: bool = False,
 ) -> pandas.DataFrame:
     """
     Transforms transactional data of the form
@@ -33,7 +48,25 @@ def rfm(
     to day. Multiple transactions occurring in the same period will be
     counted as a single transaction whose value is the mean of the values
     of the component transactions.
+
+    The default numpy engine converts dates to integer period ordinals
+    once and aggregates over factorized customer ids. The pandas engine
+    is the original groupby based implementation, and is kept as a
+    reference.
+
+    If n_jobs is larger than one, customers are partitioned into n_jobs
+    shards by their id, and the shards are processed in a pool of
+    n_jobs processes. The result is identical to the serial one.
+
+    If compact is set, the table is passed through compact_rfm before
+    it is returned.
     """
+    if engine not in ENGINES:
+        raise ValueError(f'Unknown engine "{engine}".')
+
+    if n_jobs < 1:
+        raise ValueError('n_jobs must be a positive integer.')
+
     if value_col is not None:
         wanted_columns = {date_col, customer_id_col, value_col}
     else:
@@ -48,6 +81,81 @@ def rfm(
             transactions[date_col].max()
         )
 
+    if n_jobs > 1:
+        rfm_df = _rfm_sharded(
+            transactions=transactions[list(wanted_columns)],
+            n_jobs=n_jobs,
+            customer_id_col=customer_id_col,
+            date_col=date_col,
+            value_col=value_col,
+            period=period,
+            observation_period_end=observation_period_end,
+            engine=engine,
+        )
+    elif engine == 'numpy':
+        rfm_df = _rfm_numpy(
+            transactions=transactions,
+            customer_id_col=customer_id_col,
+            date_col=date_col,
+            value_col=value_col,
+            period=period,
+            observation_period_end=observation_period_end,
+        )
+    else:
+        rfm_df = _rfm_pandas(
+            transactions=transactions,
+            customer_id_col=customer_id_col,
+            date_col=date_col,
+            value_col=value_col,
+            period=period,
+            observation_period_end=observation_period_end,
+        )
+
+    if compact:
+        rfm_df = compact_rfm(rfm_df)
+
+    return rfm_df
+
+
+def compact_rfm(
+    rfm_df: pandas.DataFrame,
+    value_dtype: typing.Any = numpy.float64,
+) -> pandas.DataFrame:
+    """
+    Returns a copy of an rfm table that uses less memory. Non-integer
+    ids become a categorical with the ids as categories in their current
+    order, so that copies and merges of the table only move integer
+    codes. Integer columns, such as id, recency, frequency and T, are
+    downcast to the smallest integer type that holds their values, and
+    float columns, such as value, are cast to value_dtype. Passing
+    numpy.float32 as value_dtype halves the memory used by values, at
+    the cost of cent precision for values beyond about 10^5.
+    """
+    columns = {}
+    for name, column in rfm_df.items():
+        if name == 'id' and not (
+            pandas.api.types.is_integer_dtype(column)
+            or isinstance(column.dtype, pandas.CategoricalDtype)
+        ):
+            codes, ids = pandas.factorize(column)
+            column = pandas.Categorical.from_codes(codes, categories=ids)
+        elif pandas.api.types.is_integer_dtype(column):
+            column = pandas.to_numeric(column, downcast='integer')
+        elif pandas.api.types.is_float_dtype(column):
+            column = column.astype(value_dtype)
+        columns[name] = column
+
+    return pandas.DataFrame(data=columns, index=rfm_df.index)
+
+
+def _rfm_pandas(
+    transactions: pandas.DataFrame,
+    customer_id_col: str,
+    date_col: str,
+    value_col: typing.Optional[str],
+    period: str,
+    observation_period_end: typing.Any,
+) -> pandas.DataFrame:
     transactions_by_period = (
         transactions
         .rename(
@@ -79,6 +187,592 @@ def rfm(
     )
 
 
+def _rfm_sharded(
+    transactions: pandas.DataFrame,
+    n_jobs: int,
+    customer_id_col: str,
+    **kwargs: typing.Any
+) -> pandas.DataFrame:
+    """
+    Compute rfm tables for shards of customers in parallel, and put the
+    customers back in order of first appearance. Since every customer
+    ends up in a single shard with its transactions in their original
+    order, the per-customer results are identical to the serial ones.
+    Customers are ordered by their first transaction up to the end of
+    the observation period, as in the serial result, so later ones are
+    left out before factorizing.
+    """
+    observed = transactions[
+        pandas.to_datetime(transactions[kwargs['date_col']])
+        <= kwargs['observation_period_end']
+    ]
+    codes, ids = pandas.factorize(observed[customer_id_col])
+    shards = [
+        shard
+        for _, shard in observed.groupby(codes % n_jobs, sort=False)
+    ]
+    if not shards:
+        return rfm(transactions, customer_id_col=customer_id_col, **kwargs)
+
+    with ProcessPoolExecutor(max_workers=min(n_jobs, len(shards))) as pool:
+        results = list(
+            pool.map(
+                partial(rfm, customer_id_col=customer_id_col, **kwargs),
+                shards
+            )
+        )
+
+    # empty shards would upcast the integer columns when concatenated
+    results = [result for result in results if not result.empty] or results
+    rfm_df = pandas.concat(results, ignore_index=True)
+    order = numpy.argsort(
+        pandas.Index(ids).get_indexer(rfm_df.id),
+        kind='stable'
+    )
+
+    return rfm_df.iloc[order].reset_index(drop=True)
+
+
+@dataclass
+class _CustomerPeriods:
+    """
+    Transactions reduced to one row per (customer, period) pair, in
+    order of first appearance. Customer codes index into ids, which is
+    in order of first appearance as well.
+    """
+    ids: pandas.Index
+    customer: numpy.ndarray
+    ordinal: numpy.ndarray
+    value_sum: numpy.ndarray
+    value_count: numpy.ndarray
+
+
+def rfm_calibration_holdout(
+    transactions: pandas.DataFrame,
+    customer_id_col: str,
+    date_col: str,
+    calibration_period_end: typing.Any,
+    value_col: typing.Optional[str] = None,
+    period: str = 'D',
+    observation_period_end: typing.Optional[typing.Any] = None,
+) -> pandas.DataFrame:
+    """
+    Splits transactional data at calibration_period_end, and computes
+    the rfm table of the calibration period together with what each of
+    its customers did in the holdout period, in a single pass over the
+    transactions. The result has the columns
+        (id, recency, frequency, T, <value>,
+         frequency_holdout, <value_holdout>, duration_holdout).
+
+    - recency, frequency, value and T are as returned by rfm with
+      observation_period_end set to calibration_period_end.
+    - frequency_holdout is the number of periods in which the customer
+      made purchases after the calibration period, up to the end of the
+      observation period.
+    - value_holdout is the average value of those purchases, computed
+      the same way as value.
+    - duration_holdout is the number of periods between the end of the
+      calibration period and the end of the observation period.
+
+    Customers whose first purchase falls in the holdout period are not
+    included.
+    """
+    if value_col is not None:
+        wanted_columns = {date_col, customer_id_col, value_col}
+    else:
+        wanted_columns = {date_col, customer_id_col}
+    _check_column_presence(
+        wanted=wanted_columns,
+        present=set(transactions.columns)
+    )
+
+    dates = pandas.to_datetime(transactions[date_col])
+    if observation_period_end is None:
+        observation_period_end = dates.max()
+    observation_period_end = pandas.to_datetime(observation_period_end)
+    calibration_period_end = pandas.to_datetime(calibration_period_end)
+    if calibration_period_end >= observation_period_end:
+        raise ValueError(
+            'Calibration period must end before the observation period.'
+        )
+
+    observed = (dates <= observation_period_end).values
+    holdout = (dates > calibration_period_end).values[observed]
+    ids = transactions[customer_id_col].values[observed]
+    ordinals = _period_ordinals(dates[observed], period)
+    values = (
+        None if value_col is None
+        else transactions[value_col].values[observed]
+    )
+
+    calibration_ordinal = calibration_period_end.to_period(period).ordinal
+    observation_ordinal = observation_period_end.to_period(period).ordinal
+    rfm_df, holdout_df = (
+        _summarise_customer_periods(
+            customer_periods=_aggregate_customer_periods(
+                ids=ids[mask],
+                ordinals=ordinals[mask],
+                value_sums=None if values is None else values[mask],
+            ),
+            observation_ordinal=ordinal,
+            with_value=value_col is not None,
+        )
+        for mask, ordinal in [
+            (~holdout, calibration_ordinal),
+            (holdout, observation_ordinal),
+        ]
+    )
+
+    # customers without holdout transactions, possibly all of them, get
+    # zeros
+    holdout_df = holdout_df.set_index('id').reindex(rfm_df.id, fill_value=0)
+    rfm_df['frequency_holdout'] = holdout_df.frequency.values
+    if value_col is not None:
+        rfm_df['value_holdout'] = holdout_df.value.values
+    rfm_df['duration_holdout'] = observation_ordinal - calibration_ordinal
+
+    return rfm_df
+
+
+def rfm_rollup(
+    transactions: pandas.DataFrame,
+    customer_id_col: str,
+    date_col: str,
+    value_col: typing.Optional[str] = None,
+    periods: typing.Sequence[str] = ('D', 'W', 'M'),
+    observation_period_end: typing.Optional[typing.Any] = None,
+) -> typing.Dict[str, pandas.DataFrame]:
+    """
+    Computes the rfm tables rfm would give for each of the periods, and
+    returns them in a dict keyed by period. The transactions are
+    aggregated only once, at the first period in periods, and the
+    tables for the other periods are derived from that aggregate. Every
+    other period must therefore be made up of whole first periods, as is
+    the case for days in weeks and in months, but not for weeks in
+    months.
+
+    The aggregate keeps the sum and count of values per customer and
+    period, so that merged periods get the mean of all their component
+    transactions, as they would in rfm.
+    """
+    if value_col is not None:
+        wanted_columns = {date_col, customer_id_col, value_col}
+    else:
+        wanted_columns = {date_col, customer_id_col}
+    _check_column_presence(
+        wanted=wanted_columns,
+        present=set(transactions.columns)
+    )
+
+    if observation_period_end is None:
+        observation_period_end = pandas.to_datetime(
+            transactions[date_col].max()
+        )
+
+    finest_period, *coarser_periods = periods
+    finest = _reduce_transactions(
+        transactions=transactions,
+        customer_id_col=customer_id_col,
+        date_col=date_col,
+        value_col=value_col,
+        period=finest_period,
+        observation_period_end=observation_period_end,
+    )
+    finest_ordinals, inverse = numpy.unique(
+        finest.ordinal,
+        return_inverse=True
+    )
+    finest_periods = pandas.PeriodIndex(
+        ordinal=finest_ordinals,
+        freq=finest_period
+    )
+
+    rfm_dfs = {}
+    for period in periods:
+        if period == finest_period:
+            customer_periods = finest
+        else:
+            starts = finest_periods.start_time.to_period(period)
+            ends = finest_periods.end_time.to_period(period)
+            if not (starts == ends).all():
+                raise ValueError(
+                    f'Period "{finest_period}" is not contained in period '
+                    f'"{period}".'
+                )
+            customer_periods = _aggregate_customer_codes(
+                codes=finest.customer,
+                ids=finest.ids,
+                ordinals=starts.asi8[inverse.reshape(-1)],
+                value_sums=finest.value_sum,
+                value_counts=finest.value_count,
+            )
+
+        observation_ordinal = observation_period_end.to_period(period).ordinal
+        rfm_dfs[period] = _summarise_customer_periods(
+            customer_periods=customer_periods,
+            observation_ordinal=observation_ordinal,
+            with_value=value_col is not None,
+        )
+
+    return rfm_dfs
+
+
+def rfm_from_chunks(
+    chunks: typing.Iterable[pandas.DataFrame],
+    customer_id_col: str,
+    date_col: str,
+    value_col: typing.Optional[str] = None,
+    period: str = 'D',
+    observation_period_end: typing.Optional[typing.Any] = None,
+) -> pandas.DataFrame:
+    """
+    Computes the same rfm table as rfm, from an iterable of chunks of
+    transactional data, such as returned by pandas.read_csv with
+    chunksize set, so that the full set of transactions never needs to
+    be in memory.
+
+    Every chunk is reduced to one row per customer and period, holding
+    the sum and count of the values in that period. These partial
+    aggregates are merged as the chunks come in, so transactions in the
+    same period are counted once even if they end up in different
+    chunks. Memory use is bounded by the number of distinct
+    (customer, period) pairs rather than the number of transactions.
+    Since partial sums are added in a different order, a value can
+    differ from the one rfm computes in the last rounded digit.
+    """
+    if value_col is not None:
+        wanted_columns = {date_col, customer_id_col, value_col}
+    else:
+        wanted_columns = {date_col, customer_id_col}
+
+    if observation_period_end is not None:
+        observation_period_end = pandas.to_datetime(observation_period_end)
+
+    accumulator = _CustomerPeriodsAccumulator()
+    for chunk in chunks:
+        _check_column_presence(
+            wanted=wanted_columns,
+            present=set(chunk.columns)
+        )
+        accumulator.add(
+            _reduce_transactions(
+                transactions=chunk,
+                customer_id_col=customer_id_col,
+                date_col=date_col,
+                value_col=value_col,
+                period=period,
+                observation_period_end=observation_period_end,
+            )
+        )
+
+    return _summarise_accumulator(
+        accumulator=accumulator,
+        period=period,
+        observation_period_end=observation_period_end,
+        with_value=value_col is not None,
+    )
+
+
+def _rfm_numpy(
+    transactions: pandas.DataFrame,
+    customer_id_col: str,
+    date_col: str,
+    value_col: typing.Optional[str],
+    period: str,
+    observation_period_end: typing.Any,
+) -> pandas.DataFrame:
+    customer_periods = _reduce_transactions(
+        transactions=transactions,
+        customer_id_col=customer_id_col,
+        date_col=date_col,
+        value_col=value_col,
+        period=period,
+        observation_period_end=observation_period_end,
+    )
+
+    return _summarise_customer_periods(
+        customer_periods=customer_periods,
+        observation_ordinal=observation_period_end.to_period(period).ordinal,
+        with_value=value_col is not None,
+    )
+
+
+def _reduce_transactions(
+    transactions: pandas.DataFrame,
+    customer_id_col: str,
+    date_col: str,
+    value_col: typing.Optional[str],
+    period: str,
+    observation_period_end: typing.Optional[typing.Any],
+) -> _CustomerPeriods:
+    """
+    Reduce transactions up to and including observation_period_end to
+    one row per customer and period. If observation_period_end is None,
+    all transactions with a date are used.
+    """
+    dates = pandas.to_datetime(transactions[date_col])
+    if observation_period_end is None:
+        observed = dates.notna().values
+    else:
+        observed = (dates <= observation_period_end).values
+
+    values = (
+        None if value_col is None
+        else transactions[value_col].values[observed]
+    )
+
+    return _aggregate_customer_periods(
+        ids=transactions[customer_id_col].values[observed],
+        ordinals=_period_ordinals(dates[observed], period),
+        value_sums=values,
+    )
+
+
+@dataclass
+class _CustomerPeriodsAccumulator:
+    """
+    Merges partial customer period aggregates. Parts are buffered until
+    they are as large as the merged state, which keeps the amortized
+    cost of merging linear in the total size of the parts.
+    """
+    merged: typing.Optional[_CustomerPeriods] = None
+    pending: typing.List[_CustomerPeriods] = field(default_factory=list)
+    pending_size: int = 0
+
+    def add(self, customer_periods: _CustomerPeriods) -> None:
+        self.pending.append(customer_periods)
+        self.pending_size += len(customer_periods.customer)
+        if (
+            self.merged is None
+            or self.pending_size >= len(self.merged.customer)
+        ):
+            self._merge()
+
+    def result(self) -> _CustomerPeriods:
+        self._merge()
+        if self.merged is None:
+            return _aggregate_customer_periods(
+                ids=numpy.zeros(0),
+                ordinals=numpy.zeros(0, dtype=numpy.int64),
+            )
+
+        return self.merged
+
+    def _merge(self) -> None:
+        if not self.pending:
+            return
+
+        parts = self.pending
+        if self.merged is not None:
+            parts = [self.merged, *parts]
+
+        self.merged = _merge_customer_periods(parts)
+        self.pending = []
+        self.pending_size = 0
+
+
+def _summarise_accumulator(
+    accumulator: _CustomerPeriodsAccumulator,
+    period: str,
+    observation_period_end: typing.Optional[pandas.Timestamp],
+    with_value: bool,
+) -> pandas.DataFrame:
+    """
+    Summarise accumulated customer periods into an rfm table. If
+    observation_period_end is None, the observation period ends with
+    the last period that holds a transaction.
+    """
+    customer_periods = accumulator.result()
+    if observation_period_end is not None:
+        observation_ordinal = observation_period_end.to_period(period).ordinal
+    elif len(customer_periods.ordinal) > 0:
+        observation_ordinal = customer_periods.ordinal.max()
+    else:
+        raise ValueError('No transactions found.')
+
+    return _summarise_customer_periods(
+        customer_periods=customer_periods,
+        observation_ordinal=observation_ordinal,
+        with_value=with_value,
+    )
+
+
+def _merge_customer_periods(
+    parts: typing.Sequence[_CustomerPeriods],
+) -> _CustomerPeriods:
+    if len(parts) == 1:
+        return parts[0]
+
+    ids = parts[0].ids.take(parts[0].customer).append(
+        [part.ids.take(part.customer) for part in parts[1:]]
+    )
+
+    return _aggregate_customer_periods(
+        ids=ids,
+        ordinals=numpy.concatenate([part.ordinal for part in parts]),
+        value_sums=numpy.concatenate([part.value_sum for part in parts]),
+        value_counts=numpy.concatenate([part.value_count for part in parts]),
+    )
+
+
+def _period_ordinals(
+    dates: pandas.Series,
+    period: str
+) -> numpy.ndarray:
+    """
+    Integer ordinals of the periods the dates fall in. Differences of
+    ordinals equal the number of periods between them.
+    """
+    return dates.dt.to_period(period).array.asi8
+
+
+def _aggregate_customer_periods(
+    ids: numpy.ndarray,
+    ordinals: numpy.ndarray,
+    value_sums: typing.Optional[numpy.ndarray] = None,
+    value_counts: typing.Optional[numpy.ndarray] = None,
+) -> _CustomerPeriods:
+    """
+    Merge rows sharing a customer and a period ordinal, summing their
+    values and the number of values that went into those sums. Missing
+    values are skipped. If value_counts is not given, every non-missing
+    value counts once.
+    """
+    codes, uniques = pandas.factorize(ids)
+
+    return _aggregate_customer_codes(
+        codes=codes,
+        ids=pandas.Index(uniques),
+        ordinals=ordinals,
+        value_sums=value_sums,
+        value_counts=value_counts,
+    )
+
+
+def _aggregate_customer_codes(
+    codes: numpy.ndarray,
+    ids: pandas.Index,
+    ordinals: numpy.ndarray,
+    value_sums: typing.Optional[numpy.ndarray] = None,
+    value_counts: typing.Optional[numpy.ndarray] = None,
+) -> _CustomerPeriods:
+    """
+    As _aggregate_customer_periods, for customers that are already
+    factorized into codes indexing ids, in order of first appearance.
+    Rows with a negative code are skipped.
+    """
+    present = codes >= 0
+    codes = codes[present].astype(numpy.int64)
+    ordinals = numpy.asarray(ordinals, dtype=numpy.int64)[present]
+
+    if value_sums is None:
+        value_sums = numpy.zeros(len(codes))
+        value_counts = numpy.zeros(len(codes), dtype=numpy.int64)
+    else:
+        value_sums = numpy.asarray(value_sums, dtype=numpy.float64)[present]
+        if value_counts is None:
+            value_counts = (~numpy.isnan(value_sums)).astype(numpy.int64)
+        else:
+            value_counts = numpy.asarray(value_counts)[present]
+
+    if len(codes) == 0:
+        offset, span = 0, 1
+    else:
+        offset = ordinals.min()
+        span = ordinals.max() - offset + 1
+
+    pairs, pair_keys = pandas.factorize(codes * span + (ordinals - offset))
+
+    return _CustomerPeriods(
+        ids=ids,
+        customer=pair_keys // span,
+        ordinal=pair_keys % span + offset,
+        value_sum=_group_sum(value_sums, pairs, len(pair_keys)),
+        value_count=numpy.bincount(
+            pairs,
+            weights=value_counts,
+            minlength=len(pair_keys)
+        ).astype(numpy.int64),
+    )
+
+
+def _summarise_customer_periods(
+    customer_periods: _CustomerPeriods,
+    observation_ordinal: int,
+    with_value: bool,
+) -> pandas.DataFrame:
+    customer = customer_periods.customer
+    n_customers = len(customer_periods.ids)
+
+    frequency = numpy.bincount(customer, minlength=n_customers)
+    order = numpy.argsort(customer, kind='stable')
+    starts = numpy.cumsum(frequency) - frequency
+    ordinal = customer_periods.ordinal[order]
+    if n_customers > 0:
+        first = numpy.minimum.reduceat(ordinal, starts)
+        last = numpy.maximum.reduceat(ordinal, starts)
+    else:
+        first = last = ordinal
+
+    rfm_df = pandas.DataFrame(
+        data={
+            'id': customer_periods.ids,
+            'recency': observation_ordinal - last,
+            'frequency': frequency,
+            'T': observation_ordinal - first,
+        }
+    )
+
+    if not with_value:
+        return rfm_df
+
+    # a customer's value is the mean over periods of the mean value
+    # within each period
+    valued = customer_periods.value_count > 0
+    period_mean = numpy.where(
+        valued,
+        customer_periods.value_sum / numpy.maximum(
+            customer_periods.value_count,
+            1
+        ),
+        numpy.nan
+    )
+    valued_periods = numpy.bincount(
+        customer,
+        weights=valued,
+        minlength=n_customers
+    )
+    # customers without any value get nan, and then 0, without the
+    # warning dividing by zero gives
+    value = numpy.divide(
+        _group_sum(period_mean, customer, n_customers),
+        valued_periods,
+        out=numpy.full(n_customers, numpy.nan),
+        where=valued_periods > 0
+    )
+
+    return rfm_df.assign(value=numpy.nan_to_num(value).round(2))
+
+
+def _group_sum(
+    values: numpy.ndarray,
+    groups: numpy.ndarray,
+    n_groups: int
+) -> numpy.ndarray:
+    """
+    Sum of the non-missing values per group code, using the same
+    compensated summation as pandas' groupby, so that means come out
+    identical to the pandas engine.
+    """
+    return (
+        pandas.Series(values)
+        .groupby(groups)
+        .sum()
+        .reindex(range(n_groups), fill_value=0)
+        .values
+    )
+
+
 def _determine_monetary_value(
     transactions: pandas.DataFrame,
 ) -> pandas.DataFrame:
@@ -0,0 +1,140 @@
+import os.path
+import typing
+
+import pandas
+
+from .rfm import (
+    _aggregate_customer_codes,
+    _check_column_presence,
+    _CustomerPeriods,
+    _CustomerPeriodsAccumulator,
+    _period_ordinals,
+    _summarise_accumulator,
+)
+
+__all__ = ('rfm_from_arrow',)
+
+FILE_FORMATS = ('parquet', 'ipc')
+
+
+def rfm_from_arrow(
+    path: str,
+    customer_id_col: str,
+    date_col: str,
+    value_col: typing.Optional[str] = None,
+    period: str = 'D',
+    observation_period_end: typing.Optional[typing.Any] = None,
+    file_format: str = 'parquet',
+) -> pandas.DataFrame:
+    """
+    Computes the same rfm table as rfm, reading transactions straight
+    from a Parquet or Arrow IPC (Feather v2) file, or a directory of
+    such files, on the local filesystem. Requires pyarrow.
+
+    Only the customer, date and value columns are read. Files are
+    memory-mapped, so Arrow IPC record batches are used without copying
+    them, and each record batch is reduced on its own before the partial
+    aggregates are merged, as in rfm_from_chunks. Customer ids are
+    dictionary encoded by Arrow, so no Python objects are created per
+    transaction.
+    """
+    if file_format not in FILE_FORMATS:
+        raise ValueError(f'Unknown file format "{file_format}".')
+
+    dataset, fs = _import_pyarrow_dataset()
+
+    transactions = dataset.dataset(
+        os.path.abspath(path),
+        format=file_format,
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+    )
+
+    if value_col is not None:
+        wanted_columns = [customer_id_col, date_col, value_col]
+    else:
+        wanted_columns = [customer_id_col, date_col]
+    _check_column_presence(
+        wanted=set(wanted_columns),
+        present=set(transactions.schema.names)
+    )
+
+    if observation_period_end is not None:
+        observation_period_end = pandas.to_datetime(observation_period_end)
+
+    accumulator = _CustomerPeriodsAccumulator()
+    for batch in transactions.to_batches(columns=wanted_columns):
+        accumulator.add(
+            _reduce_record_batch(
+                batch=batch,
+                customer_id_col=customer_id_col,
+                date_col=date_col,
+                value_col=value_col,
+                period=period,
+                observation_period_end=observation_period_end,
+            )
+        )
+
+    return _summarise_accumulator(
+        accumulator=accumulator,
+        period=period,
+        observation_period_end=observation_period_end,
+        with_value=value_col is not None,
+    )
+
+
+def _reduce_record_batch(
+    batch: typing.Any,
+    customer_id_col: str,
+    date_col: str,
+    value_col: typing.Optional[str],
+    period: str,
+    observation_period_end: typing.Optional[pandas.Timestamp],
+) -> _CustomerPeriods:
+    dates = pandas.to_datetime(batch.column(date_col).to_pandas())
+    if observation_period_end is None:
+        observed = dates.notna().values
+    else:
+        observed = (dates <= observation_period_end).values
+
+    ids = batch.column(customer_id_col)
+    observed &= ids.is_valid().to_numpy(zero_copy_only=False)
+    if not observed.all():
+        batch = batch.filter(observed)
+        dates = dates[observed]
+        ids = batch.column(customer_id_col)
+
+    encoded = _dictionary_encode(ids)
+    values = (
+        None if value_col is None
+        else batch.column(value_col).to_numpy(zero_copy_only=False)
+    )
+
+    return _aggregate_customer_codes(
+        codes=encoded.indices.to_numpy(zero_copy_only=False),
+        ids=pandas.Index(encoded.dictionary.to_pandas()),
+        ordinals=_period_ordinals(dates, period),
+        value_sums=values,
+    )
+
+
+def _dictionary_encode(ids: typing.Any) -> typing.Any:
+    # Dictionaries read from files can hold entries that are not used
+    # in this batch, so they are decoded and encoded again.
+    import pyarrow
+
+    if pyarrow.types.is_dictionary(ids.type):
+        ids = ids.dictionary_decode()
+
+    return ids.dictionary_encode()
+
+
+def _import_pyarrow_dataset() -> typing.Tuple[typing.Any, typing.Any]:
+    try:
+        from pyarrow import dataset, fs
+    except ImportError as error:
+        raise ImportError(
+            'Reading transactions from Arrow or Parquet files requires '
+            'pyarrow to be installed.'
+        ) from error
+
+    return dataset, fs
@@ -0,0 +1,286 @@
+import os.path
+import pickle
+import tempfile
+import typing
+
+import numpy
+import pandas
+
+from .rfm import (
+    _aggregate_customer_periods,
+    _check_column_presence,
+    _CustomerPeriods,
+    _reduce_transactions,
+    _summarise_customer_periods,
+)
+
+__all__ = (
+    'rfm_out_of_core',
+    'rfm_out_of_core_to_parquet',
+)
+
+# transactions are hashed into 2**SPILL_PARTITION_BITS on-disk
+# partitions, using that many bits of the 64 bit hash of the customer
+# id; a partition too large for the memory limit is split again on the
+# next bits, see _partitions, and buckets are formed from one or more of
+# the resulting partitions
+SPILL_PARTITION_BITS = 8
+SPILL_PARTITIONS = 2**SPILL_PARTITION_BITS
+# estimated ratio between the memory needed to reduce a bucket and the
+# size of its spilled partial aggregates on disk
+SPILL_MEMORY_FACTOR = 4
+
+
+def rfm_out_of_core(
+    chunks: typing.Iterable[pandas.DataFrame],
+    customer_id_col: str,
+    date_col: str,
+    value_col: typing.Optional[str] = None,
+    period: str = 'D',
+    observation_period_end: typing.Optional[typing.Any] = None,
+    memory_limit: int = 2**30,
+    directory: typing.Optional[str] = None,
+) -> typing.Iterator[pandas.DataFrame]:
+    """
+    Computes the same rows as rfm_from_chunks, for customer bases whose
+    aggregates do not fit in memory, and yields them as a sequence of
+    rfm tables, each holding a disjoint set of customers.
+
+    Every chunk is reduced to per customer and period aggregates, which
+    are spilled to files in a temporary directory inside directory,
+    partitioned by a hash of the customer id. Once all chunks are
+    spilled, the partitions are grouped into buckets whose estimated
+    memory use stays below memory_limit (in bytes), and each bucket is
+    reduced to an rfm table on its own. A partition larger than the
+    limit is first split into smaller ones on further bits of the hash,
+    and only one that cannot be split any further, holding customers
+    with the same hash, is reduced regardless of the limit.
+
+    Within a table, customers are in order of first appearance. The
+    spilling happens when iteration starts, and the temporary files are
+    removed once it is done.
+    """
+    if value_col is not None:
+        wanted_columns = {date_col, customer_id_col, value_col}
+    else:
+        wanted_columns = {date_col, customer_id_col}
+
+    if observation_period_end is not None:
+        observation_period_end = pandas.to_datetime(observation_period_end)
+
+    with tempfile.TemporaryDirectory(dir=directory) as spill_directory:
+        paths = [
+            os.path.join(spill_directory, f'partition-{partition}.pkl')
+            for partition in range(SPILL_PARTITIONS)
+        ]
+        last_ordinal = None
+        for chunk in chunks:
+            _check_column_presence(
+                wanted=wanted_columns,
+                present=set(chunk.columns)
+            )
+            customer_periods = _reduce_transactions(
+                transactions=chunk,
+                customer_id_col=customer_id_col,
+                date_col=date_col,
+                value_col=value_col,
+                period=period,
+                observation_period_end=observation_period_end,
+            )
+            if len(customer_periods.ordinal) > 0:
+                chunk_last_ordinal = customer_periods.ordinal.max()
+                if last_ordinal is None or chunk_last_ordinal > last_ordinal:
+                    last_ordinal = chunk_last_ordinal
+            if len(customer_periods.customer) > 0:
+                _spill(
+                    (
+                        customer_periods.ids.values[customer_periods.customer],
+                        customer_periods.ordinal,
+                        customer_periods.value_sum,
+                        customer_periods.value_count,
+                    ),
+                    paths,
+                    depth=0,
+                )
+
+        if observation_period_end is not None:
+            observation_ordinal = (
+                observation_period_end.to_period(period).ordinal
+            )
+        elif last_ordinal is not None:
+            observation_ordinal = last_ordinal
+        else:
+            raise ValueError('No transactions found.')
+
+        for bucket in _buckets(
+            _partitions(paths, memory_limit, depth=0),
+            memory_limit
+        ):
+            yield _summarise_customer_periods(
+                customer_periods=_load_bucket(bucket),
+                observation_ordinal=observation_ordinal,
+                with_value=value_col is not None,
+            )
+
+
+def rfm_out_of_core_to_parquet(
+    path: str,
+    chunks: typing.Iterable[pandas.DataFrame],
+    customer_id_col: str,
+    date_col: str,
+    value_col: typing.Optional[str] = None,
+    period: str = 'D',
+    observation_period_end: typing.Optional[typing.Any] = None,
+    memory_limit: int = 2**30,
+    directory: typing.Optional[str] = None,
+) -> typing.List[str]:
+    """
+    Runs rfm_out_of_core, and writes every table it yields to a Parquet
+    file in the directory path, which together form a Parquet dataset.
+    Returns the paths of the written files. Requires pyarrow.
+    """
+    os.makedirs(path, exist_ok=True)
+    file_paths = []
+    rfm_dfs = rfm_out_of_core(
+        chunks=chunks,
+        customer_id_col=customer_id_col,
+        date_col=date_col,
+        value_col=value_col,
+        period=period,
+        observation_period_end=observation_period_end,
+        memory_limit=memory_limit,
+        directory=directory,
+    )
+    for part, rfm_df in enumerate(rfm_dfs):
+        file_path = os.path.join(path, f'part-{part:05d}.parquet')
+        rfm_df.to_parquet(file_path, index=False)
+        file_paths.append(file_path)
+
+    return file_paths
+
+
+def _spill(
+    part: typing.Tuple[numpy.ndarray, ...],
+    paths: typing.Sequence[str],
+    depth: int,
+) -> numpy.ndarray:
+    """
+    Append the rows of part, arrays of customer ids, period ordinals,
+    value sums and value counts, to the partition files, with customers
+    assigned to partitions by the bits of a hash of their id at depth.
+    Returns the hashes.
+    """
+    ids = part[0]
+    # the same id may be read as an integer in one chunk and a float in
+    # another, and has to end up in the same partition either way
+    if ids.dtype.kind in 'biuf':
+        ids = ids.astype(numpy.float64)
+    hashes = pandas.util.hash_array(ids)
+    partitions = (
+        (hashes >> numpy.uint64(SPILL_PARTITION_BITS * depth))
+        % numpy.uint64(len(paths))
+    ).astype(numpy.int64)
+    order = numpy.argsort(partitions, kind='stable')
+    present, starts = numpy.unique(partitions[order], return_index=True)
+    for partition, rows in zip(present, numpy.split(order, starts[1:])):
+        with open(paths[partition], 'ab') as partition_file:
+            pickle.dump(
+                tuple(values[rows] for values in part),
+                partition_file,
+                protocol=pickle.HIGHEST_PROTOCOL
+            )
+
+    return hashes
+
+
+def _partitions(
+    paths: typing.Sequence[str],
+    memory_limit: int,
+    depth: int,
+) -> typing.Iterator[str]:
+    """
+    Yield the partition files that exist, after splitting each one whose
+    estimated memory use for reduction exceeds memory_limit on the next
+    bits of the hash, as long as there are bits left and it holds more
+    than one hash.
+    """
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+
+        if (
+            os.path.getsize(path) * SPILL_MEMORY_FACTOR <= memory_limit
+            or SPILL_PARTITION_BITS * (depth + 1) >= 64
+        ):
+            yield path
+            continue
+
+        split_paths = [
+            f'{os.path.splitext(path)[0]}-{partition}.pkl'
+            for partition in range(SPILL_PARTITIONS)
+        ]
+        lowest, highest = numpy.iinfo(numpy.uint64).max, 0
+        for part in _read_parts(path):
+            hashes = _spill(part, split_paths, depth=depth + 1)
+            lowest = min(lowest, hashes.min())
+            highest = max(highest, hashes.max())
+        os.remove(path)
+
+        if lowest == highest:
+            # a single customer, or customers whose hashes collide
+            yield from (
+                split_path for split_path in split_paths
+                if os.path.exists(split_path)
+            )
+        else:
+            yield from _partitions(split_paths, memory_limit, depth + 1)
+
+
+def _buckets(
+    paths: typing.Sequence[str],
+    memory_limit: int,
+) -> typing.Iterator[typing.List[str]]:
+    """
+    Group the partition files into buckets whose estimated memory use
+    for reduction stays below memory_limit.
+    """
+    bucket: typing.List[str] = []
+    bucket_size = 0
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+
+        size = os.path.getsize(path) * SPILL_MEMORY_FACTOR
+        if bucket and bucket_size + size > memory_limit:
+            yield bucket
+            bucket, bucket_size = [], 0
+        bucket.append(path)
+        bucket_size += size
+
+    if bucket:
+        yield bucket
+
+
+def _load_bucket(paths: typing.Sequence[str]) -> _CustomerPeriods:
+    parts = [part for path in paths for part in _read_parts(path)]
+    ids, ordinals, value_sums, value_counts = (
+        numpy.concatenate(arrays) for arrays in zip(*parts)
+    )
+
+    return _aggregate_customer_periods(
+        ids=ids,
+        ordinals=ordinals,
+        value_sums=value_sums,
+        value_counts=value_counts,
+    )
+
+
+def _read_parts(
+    path: str,
+) -> typing.Iterator[typing.Tuple[numpy.ndarray, ...]]:
+    with open(path, 'rb') as partition_file:
+        while True:
+            try:
+                yield pickle.load(partition_file)
+            except EOFError:
+                return
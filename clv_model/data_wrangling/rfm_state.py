@@ -0,0 +1,288 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+import pickle
+import typing
+
+import numpy
+import pandas
+
+from .rfm import (
+    _aggregate_customer_periods,
+    _check_column_presence,
+    _CustomerPeriods,
+    _reduce_transactions,
+)
+
+__all__ = ('RFMState',)
+
+
+# value of each per-customer array for customers not seen yet
+_CUSTOMER_DEFAULTS = {
+    'first_ordinal': numpy.iinfo(numpy.int64).max,
+    'last_ordinal': 0,
+    'frequency': 0,
+    'closed_value_sum': 0.0,
+    'closed_value_count': 0,
+    'last_value_sum': 0.0,
+    'last_value_count': 0,
+}
+
+
+def _empty(dtype: typing.Any) -> typing.Callable[[], numpy.ndarray]:
+    return lambda: numpy.zeros(0, dtype=dtype)
+
+
+@dataclass
+class RFMState:
+    """
+    Per-customer rfm aggregates that can absorb batches of new
+    transactions and move the observation period end forward, without
+    revisiting earlier transactions. to_rfm gives the table rfm would
+    give on all transactions absorbed so far.
+
+    Periods are stored as integer ordinals, so recency and T follow from
+    the observation period end only when the table is produced. The
+    value sum and count of each customer's last period are kept apart
+    from those of earlier periods, since transactions arriving later in
+    that same period still have to be merged into it.
+
+    The per-customer arrays have room for more customers than ids, and
+    grow by doubling, while rows maps each id to its row, so that an
+    update costs time in the size of the batch rather than the number
+    of customers seen so far.
+    """
+    customer_id_col: str
+    date_col: str
+    value_col: typing.Optional[str] = None
+    period: str = 'D'
+    observation_period_end: typing.Optional[pandas.Timestamp] = None
+    ids: typing.List[typing.Hashable] = field(default_factory=list)
+    rows: typing.Dict[typing.Hashable, int] = field(default_factory=dict)
+    first_ordinal: numpy.ndarray = field(default_factory=_empty(numpy.int64))
+    last_ordinal: numpy.ndarray = field(default_factory=_empty(numpy.int64))
+    frequency: numpy.ndarray = field(default_factory=_empty(numpy.int64))
+    closed_value_sum: numpy.ndarray = field(default_factory=_empty(float))
+    closed_value_count: numpy.ndarray = field(
+        default_factory=_empty(numpy.int64)
+    )
+    last_value_sum: numpy.ndarray = field(default_factory=_empty(float))
+    last_value_count: numpy.ndarray = field(
+        default_factory=_empty(numpy.int64)
+    )
+
+    def update(
+        self,
+        transactions: pandas.DataFrame,
+        observation_period_end: typing.Optional[typing.Any] = None,
+    ) -> RFMState:
+        """
+        Absorb transactions up to and including observation_period_end,
+        which defaults to the latest of the current observation period
+        end and the last transaction date. All transactions must be
+        later than the current observation period end, and none later
+        than observation_period_end.
+        """
+        if self.value_col is not None:
+            wanted_columns = {
+                self.date_col,
+                self.customer_id_col,
+                self.value_col
+            }
+        else:
+            wanted_columns = {self.date_col, self.customer_id_col}
+        _check_column_presence(
+            wanted=wanted_columns,
+            present=set(transactions.columns)
+        )
+
+        dates = pandas.to_datetime(transactions[self.date_col])
+        if observation_period_end is None:
+            observation_period_end = max(
+                (
+                    date for date in
+                    (dates.max(), self.observation_period_end)
+                    if not pandas.isna(date)
+                ),
+                default=None
+            )
+            if observation_period_end is None:
+                raise ValueError('No transactions found.')
+        else:
+            observation_period_end = pandas.to_datetime(observation_period_end)
+            if (dates > observation_period_end).any():
+                raise ValueError(
+                    'Transactions must not be later than the observation '
+                    'period end.'
+                )
+
+        if self.observation_period_end is not None:
+            if observation_period_end < self.observation_period_end:
+                raise ValueError(
+                    'Observation period end cannot be moved backwards.'
+                )
+            if (dates <= self.observation_period_end).any():
+                raise ValueError(
+                    'Transactions must be later than the current '
+                    'observation period end.'
+                )
+
+        self._absorb(
+            _reduce_transactions(
+                transactions=transactions,
+                customer_id_col=self.customer_id_col,
+                date_col=self.date_col,
+                value_col=self.value_col,
+                period=self.period,
+                observation_period_end=observation_period_end,
+            )
+        )
+        self.observation_period_end = observation_period_end
+
+        return self
+
+    def to_rfm(self) -> pandas.DataFrame:
+        if self.observation_period_end is None:
+            raise ValueError(
+                'State must be updated with transactions before an rfm '
+                'table can be made.'
+            )
+
+        observation_ordinal = (
+            self.observation_period_end.to_period(self.period).ordinal
+        )
+        size = len(self.ids)
+        rfm_df = pandas.DataFrame(
+            data={
+                'id': self.ids,
+                'recency': observation_ordinal - self.last_ordinal[:size],
+                'frequency': self.frequency[:size],
+                'T': observation_ordinal - self.first_ordinal[:size],
+            }
+        )
+
+        if self.value_col is None:
+            return rfm_df
+
+        last_value_count = self.last_value_count[:size]
+        last_valued = last_value_count > 0
+        value_sum = self.closed_value_sum[:size] + numpy.where(
+            last_valued,
+            self.last_value_sum[:size] / numpy.maximum(last_value_count, 1),
+            0
+        )
+        value_count = self.closed_value_count[:size] + last_valued
+        value = numpy.divide(
+            value_sum,
+            value_count,
+            out=numpy.zeros(len(value_sum)),
+            where=value_count > 0
+        )
+
+        return rfm_df.assign(value=value.round(2))
+
+    def to_file(self, file_path: str) -> None:
+        with open(file_path, 'wb') as state_file:
+            pickle.dump(self, state_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def from_file(cls, file_path: str) -> RFMState:
+        with open(file_path, 'rb') as state_file:
+            state = pickle.load(state_file)
+
+        if not isinstance(state, cls):
+            raise ValueError(f'File "{file_path}" does not hold an RFMState.')
+
+        return state
+
+    def _absorb(self, customer_periods: _CustomerPeriods) -> None:
+        if len(customer_periods.customer) == 0:
+            return
+
+        ids = customer_periods.ids.tolist()
+        rows = numpy.fromiter(
+            (self.rows.get(customer_id, -1) for customer_id in ids),
+            dtype=numpy.int64,
+            count=len(ids)
+        )
+        new = rows < 0
+        rows[new] = len(self.ids) + numpy.arange(new.sum())
+        self._append_customers(
+            [customer_id for customer_id, is_new in zip(ids, new) if is_new]
+        )
+
+        # Reopen the last period of returning customers, so that new
+        # transactions in that period are merged into it rather than
+        # counted as a period of their own.
+        returning = rows[~new]
+        self.frequency[returning] -= 1
+        merged = _aggregate_customer_periods(
+            ids=numpy.concatenate(
+                [returning, rows[customer_periods.customer]]
+            ),
+            ordinals=numpy.concatenate(
+                [self.last_ordinal[returning], customer_periods.ordinal]
+            ),
+            value_sums=numpy.concatenate(
+                [self.last_value_sum[returning], customer_periods.value_sum]
+            ),
+            value_counts=numpy.concatenate(
+                [
+                    self.last_value_count[returning],
+                    customer_periods.value_count
+                ]
+            ),
+        )
+
+        row = merged.ids.values[merged.customer]
+        order = numpy.lexsort((merged.ordinal, row))
+        row = row[order]
+        ordinal = merged.ordinal[order]
+        value_sum = merged.value_sum[order]
+        value_count = merged.value_count[order]
+
+        boundaries = row[1:] != row[:-1]
+        is_first = numpy.concatenate([[True], boundaries])
+        is_last = numpy.concatenate([boundaries, [True]])
+
+        touched, periods = numpy.unique(row, return_counts=True)
+        self.frequency[touched] += periods
+
+        first_rows = row[is_first]
+        self.first_ordinal[first_rows] = numpy.minimum(
+            self.first_ordinal[first_rows],
+            ordinal[is_first]
+        )
+
+        last_rows = row[is_last]
+        self.last_ordinal[last_rows] = ordinal[is_last]
+        self.last_value_sum[last_rows] = value_sum[is_last]
+        self.last_value_count[last_rows] = value_count[is_last]
+
+        closed = ~is_last & (value_count > 0)
+        if closed.any():
+            closed_rows, starts = numpy.unique(row[closed], return_index=True)
+            self.closed_value_sum[closed_rows] += numpy.add.reduceat(
+                value_sum[closed] / value_count[closed],
+                starts
+            )
+            self.closed_value_count[closed_rows] += numpy.diff(
+                numpy.append(starts, closed.sum())
+            )
+
+    def _append_customers(self, ids: typing.List[typing.Hashable]) -> None:
+        if len(ids) == 0:
+            return
+
+        start = len(self.ids)
+        self.rows.update(zip(ids, range(start, start + len(ids))))
+        self.ids.extend(ids)
+        capacity = len(self.frequency)
+        if len(self.ids) <= capacity:
+            return
+
+        capacity = max(len(self.ids), 2 * capacity)
+        for name, default in _CUSTOMER_DEFAULTS.items():
+            values = getattr(self, name)
+            grown = numpy.full(capacity, default, dtype=values.dtype)
+            grown[:len(values)] = values
+            setattr(self, name, grown)
@@ -0,0 +1,109 @@
+from __future__ import annotations
+from dataclasses import asdict, dataclass, field
+import json
+from typing import Any, Dict, Optional, Sequence
+
+import numpy
+
+__all__ = ('FitDiagnostics',)
+
+# default of Stan's max_treedepth control argument
+DEFAULT_MAX_TREEDEPTH = 10
+
+
+@dataclass
+class FitDiagnostics:
+    """
+    Summary of a fit of a Stan model, for tuning chains, iterations and
+    model variants, which StanModelBase.fit keeps in fit_diagnostics.
+
+    seconds holds the wall time per phase of the fit: 'prepare' for
+    collapsing or sampling the data, 'warmup' and 'sampling' for NUTS,
+    or 'fit' for vb and optimizing, and 'extract' for reading the draws.
+    Stan does not report the time spent in warmup, so the time in Stan
+    is split between warmup and sampling in proportion to the number of
+    leapfrog steps, that is, gradient evaluations, in each.
+
+    The sampler diagnostics are only set when sampling, and
+    ess_per_second is the effective sample size per second of the whole
+    fit.
+    """
+    model_name: str
+    method: str
+    rows: int
+    # number of customers the rows stand for, which is the sum of the
+    # weights of a collapsed or subsampled fit
+    customers: float
+    seconds: Dict[str, float]
+    chains: Optional[int] = None
+    draws: Optional[int] = None
+    # mean adapted step size over chains
+    stepsize: Optional[float] = None
+    divergences: Optional[int] = None
+    max_treedepth_hits: Optional[int] = None
+    effective_sample_size: Dict[str, float] = field(default_factory=dict)
+    ess_per_second: Dict[str, float] = field(default_factory=dict)
+    r_hat: Dict[str, float] = field(default_factory=dict)
+
+    def add_sampler_diagnostics(
+        self,
+        fit: Any,
+        parameters: Sequence[str],
+        stan_seconds: float,
+        max_treedepth: int = DEFAULT_MAX_TREEDEPTH,
+    ) -> None:
+        """
+        Add the diagnostics of fit, a pystan StanFit4Model, which took
+        stan_seconds to sample.
+        """
+        chains = fit.get_sampler_params(inc_warmup=False)
+        chains_with_warmup = fit.get_sampler_params(inc_warmup=True)
+
+        leapfrogs = sum(chain['n_leapfrog__'].sum() for chain in chains)
+        leapfrogs_with_warmup = sum(
+            chain['n_leapfrog__'].sum() for chain in chains_with_warmup
+        )
+        sampling_share = (
+            leapfrogs / leapfrogs_with_warmup if leapfrogs_with_warmup > 0
+            else 1.0
+        )
+        self.seconds['warmup'] = stan_seconds * (1 - sampling_share)
+        self.seconds['sampling'] = stan_seconds * sampling_share
+
+        self.chains = len(chains)
+        self.draws = sum(len(chain['divergent__']) for chain in chains)
+        self.stepsize = float(numpy.mean(fit.get_stepsize()))
+        self.divergences = int(
+            sum(chain['divergent__'].sum() for chain in chains)
+        )
+        self.max_treedepth_hits = int(
+            sum(
+                (chain['treedepth__'] >= max_treedepth).sum()
+                for chain in chains
+            )
+        )
+
+        summary = fit.summary(pars=list(parameters))
+        columns = list(summary['summary_colnames'])
+        for name, row in zip(summary['summary_rownames'], summary['summary']):
+            self.effective_sample_size[name] = float(
+                row[columns.index('n_eff')]
+            )
+            self.r_hat[name] = float(row[columns.index('Rhat')])
+
+    def finish(self) -> None:
+        """
+        Compute ess_per_second, once all phases are timed.
+        """
+        total_seconds = sum(self.seconds.values())
+        self.ess_per_second = {
+            name: ess / total_seconds
+            for name, ess in self.effective_sample_size.items()
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, text: str) -> FitDiagnostics:
+        return cls(**json.loads(text))
@@ -0,0 +1,136 @@
+from typing import Optional, Tuple
+
+import numpy
+
+__all__ = (
+    'COMPRESSION_METHODS',
+    'compress_draws',
+)
+
+COMPRESSION_METHODS = ('thin', 'quantile', 'herding')
+# number of draws the kernel herding bandwidth is estimated from
+HERDING_BANDWIDTH_DRAWS = 1000
+# number of draws the kernel is evaluated against at once
+HERDING_CHUNK_SIZE = 512
+
+
+def compress_draws(
+    draws: numpy.ndarray,
+    n_points: int,
+    method: str = 'herding',
+    seed: Optional[int] = None
+) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Select a small set of representative draws from draws, an array of
+    shape (number of draws, number of parameters) of positive parameters,
+    and return the indices of the selected draws with their weights,
+    which add up to one. The method is one of
+    - 'thin': n_points evenly spaced draws, with equal weights,
+    - 'quantile': the draws at the medians of n_points equally sized
+      quantile groups along the first principal component of the log
+      draws, with equal weights,
+    - 'herding': n_points steps of kernel herding on the standardised log
+      draws, which greedily matches the kernel mean of all draws, with a
+      draw selected k times weighted k / n_points.
+    Thinning relies on the draws being in random order, as Stan's
+    permuted draws are. Herding uses seed to pick the draws its
+    bandwidth is estimated from.
+    """
+    if method not in COMPRESSION_METHODS:
+        raise ValueError(f'Unknown compression method "{method}".')
+
+    if n_points < 1:
+        raise ValueError('Number of points must be a positive integer.')
+
+    n_draws = len(draws)
+    if n_points >= n_draws:
+        return numpy.arange(n_draws), numpy.full(n_draws, 1 / n_draws)
+
+    log_draws = numpy.log(draws)
+    scale = log_draws.std(axis=0)
+    standardised = (
+        (log_draws - log_draws.mean(axis=0))
+        / numpy.where(scale > 0, scale, 1)
+    )
+
+    if method == 'thin':
+        indices = numpy.linspace(0, n_draws - 1, n_points).round()
+        return indices.astype(numpy.int64), numpy.full(n_points, 1 / n_points)
+
+    if method == 'quantile':
+        return _quantile_draws(standardised, n_points)
+
+    return _herding_draws(
+        standardised,
+        n_points,
+        random_state=numpy.random.RandomState(seed)
+    )
+
+
+def _quantile_draws(
+    standardised: numpy.ndarray,
+    n_points: int
+) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    _, _, components = numpy.linalg.svd(standardised, full_matrices=False)
+    order = numpy.argsort(standardised @ components[0], kind='stable')
+    groups = numpy.array_split(order, n_points)
+
+    return (
+        numpy.array([group[len(group) // 2] for group in groups]),
+        numpy.array([len(group) for group in groups]) / len(order)
+    )
+
+
+def _herding_draws(
+    standardised: numpy.ndarray,
+    n_points: int,
+    random_state: numpy.random.RandomState
+) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    n_draws = len(standardised)
+
+    # median heuristic for the bandwidth of the Gaussian kernel
+    subset = standardised[
+        random_state.choice(
+            n_draws,
+            size=min(n_draws, HERDING_BANDWIDTH_DRAWS),
+            replace=False
+        )
+    ]
+    distances = _squared_distances(subset, subset)
+    squared_bandwidth = numpy.median(distances[distances > 0]) / 2
+
+    def kernel(x: numpy.ndarray, y: numpy.ndarray) -> numpy.ndarray:
+        return numpy.exp(
+            -_squared_distances(x, y) / (2 * squared_bandwidth)
+        )
+
+    # kernel mean embedding of the draws, evaluated at every draw
+    kernel_mean = numpy.concatenate(
+        [
+            kernel(
+                standardised[start:start + HERDING_CHUNK_SIZE],
+                standardised
+            ).mean(axis=1)
+            for start in range(0, n_draws, HERDING_CHUNK_SIZE)
+        ]
+    )
+
+    selected = numpy.empty(n_points, dtype=numpy.int64)
+    kernel_sum = numpy.zeros(n_draws)
+    for step in range(n_points):
+        index = numpy.argmax(kernel_mean - kernel_sum / (step + 1))
+        selected[step] = index
+        kernel_sum += kernel(standardised, standardised[[index]])[:, 0]
+
+    indices, counts = numpy.unique(selected, return_counts=True)
+
+    return indices, counts / n_points
+
+
+def _squared_distances(x: numpy.ndarray, y: numpy.ndarray) -> numpy.ndarray:
+    return numpy.maximum(
+        (x**2).sum(axis=1)[:, None]
+        + (y**2).sum(axis=1)[None, :]
+        - 2 * x @ y.T,
+        0
+    )
@@ -1,34 +1,85 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from importlib import resources
-import pickle
-from typing import Optional, TypeVar
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+import json
+import os
+from time import perf_counter
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TYPE_CHECKING,
+    TypeVar,
+    Union,
+)
 
 import numpy
 import pandas
-import pystan
+
+from .fit_diagnostics import DEFAULT_MAX_TREEDEPTH, FitDiagnostics
+from .posterior_compression import compress_draws
+from .stan_model_cache import get_stan_model
+
+if TYPE_CHECKING:
+    import pystan
 
 __all__ = (
     'Parameter',
     'StanModelBase',
+    'collapse_rows',
+    'stratified_sample',
+    'unique_rows',
 )
 
 Parameter = TypeVar('Parameter')
 
-STAN_MODELS_PACKAGE = 'clv_model.stan_models'
+FIT_METHODS = ('sampling', 'vb', 'optimizing')
+PREDICTION_DTYPES = (numpy.float64, numpy.float32)
+# estimated number of arrays with a row per customer and a column per
+# draw that are alive at once while predicting a chunk of customers
+PREDICTION_TEMPORARIES = 16
+DRAWS_FILE_FORMATS = ('csv', 'npy')
+DRAWS_METADATA_FILE = 'metadata.json'
+# fit diagnostics are written next to the draws, inside an npy
+# directory or with this suffix after a CSV file
+FIT_DIAGNOSTICS_FILE = 'fit_diagnostics.json'
+FIT_DIAGNOSTICS_SUFFIX = '.diagnostics.json'
+DRAWS_FORMAT_VERSION = 1
 
 
 class StanModelBase:
-    def __init_subclass__(cls, model_name: str, **kwargs) -> None:
-        cls._stan_model: Optional[pystan.StanModel] = _load_stan_model(
-            model_name
-        )
+    # predictions per distinct row, in order of last use, see
+    # _predict_rows
+    _prediction_cache: Optional[OrderedDict] = None
+
+    def __init_subclass__(
+        cls,
+        model_name: str,
+        marginal_model_name: Optional[str] = None,
+        data_columns: Sequence[str] = (),
+        **kwargs
+    ) -> None:
+        # compiled models are loaded on first use, see _get_stan_model
+        cls._stan_model: Optional[pystan.StanModel] = None
+        cls._marginal_stan_model: Optional[pystan.StanModel] = None
         cls.__model_name__: str = model_name
-        cls.__parameters__ = {
+        # variant of the model with per-customer latent variables
+        # integrated out, taking the columns in data_columns and a weight
+        # per row
+        cls.__marginal_model_name__: Optional[str] = marginal_model_name
+        cls.__data_columns__ = tuple(data_columns)
+        # in order of declaration, which is also their order in the
+        # marginal Stan program
+        cls.__parameters__ = tuple(
             name
             for name, type_ in cls.__annotations__.items()
             if type_ == Parameter
-        }
+        )
         cls.__annotations__.update(
             {
                 parameter: Optional[numpy.ndarray]
@@ -37,9 +88,46 @@ class StanModelBase:
         )
         for parameter in cls.__parameters__:
             setattr(cls, parameter, None)
+        # weights of the draws, which are equally weighted if None, see
+        # compress
+        cls.__annotations__['draw_weights'] = Optional[numpy.ndarray]
+        cls.draw_weights = None
+        # floating point type predictions are computed in, float32 halves
+        # the memory traffic of the arrays with a column per draw
+        cls.__annotations__['prediction_dtype'] = type
+        cls.prediction_dtype = numpy.float64
+        # memory in bytes that the arrays with a column per draw may take
+        # when predicting, see _predict_in_chunks
+        cls.__annotations__['prediction_memory_limit'] = int
+        cls.prediction_memory_limit = 2**30
+        # number of distinct rows whose predictions are kept between
+        # calls, 0 for none, see _predict_rows
+        cls.__annotations__['prediction_cache_size'] = int
+        cls.prediction_cache_size = 0
+        # diagnostics of the last fit, also used to warm start later fits,
+        # kept by the copies compress and posterior_mean make, and left
+        # out of comparisons
+        cls.__annotations__['fit_diagnostics'] = Optional[FitDiagnostics]
+        cls.fit_diagnostics = field(default=None, compare=False)
         cls = dataclass(cls)
         super().__init_subclass__(**kwargs)
 
+    def __post_init__(self) -> None:
+        if self.prediction_dtype not in PREDICTION_DTYPES:
+            raise ValueError(
+                f'Unknown prediction dtype "{self.prediction_dtype}".'
+            )
+
+        if self.prediction_memory_limit < 1:
+            raise ValueError(
+                'Prediction memory limit must be a positive integer.'
+            )
+
+        if self.prediction_cache_size < 0:
+            raise ValueError(
+                'Prediction cache size must be a non-negative integer.'
+            )
+
     def is_fitted(self) -> bool:
         return all(
             getattr(self, parameter) is not None
@@ -47,81 +135,668 @@ class StanModelBase:
         )
 
     @classmethod
-    def _compile_stan_model(cls) -> pystan.StanModel:
-        if cls._stan_model is not None:
-            return cls._stan_model
+    def _get_stan_model(cls) -> pystan.StanModel:
+        if cls._stan_model is None:
+            cls._stan_model = get_stan_model(cls.__model_name__)
+
+        return cls._stan_model
 
-        with resources.open_text(
-            STAN_MODELS_PACKAGE,
-            f'{cls.__model_name__}.stan'
-        ) as model_file:
-            cls._stan_model = pystan.StanModel(
-                model_file,
-                model_name=cls.__model_name__
+    @classmethod
+    def _get_marginal_stan_model(cls) -> pystan.StanModel:
+        if cls.__marginal_model_name__ is None:
+            raise ValueError(
+                f'Model "{cls.__model_name__}" has no marginal variant.'
             )
 
-        return cls._stan_model
+        if cls._marginal_stan_model is None:
+            cls._marginal_stan_model = get_stan_model(
+                cls.__marginal_model_name__
+            )
+
+        return cls._marginal_stan_model
+
+    def fit(
+        self,
+        data: pandas.DataFrame,
+        marginal: bool = False,
+        collapse: bool = False,
+        sample_size: Optional[int] = None,
+        sample_seed: Optional[int] = None,
+        method: str = 'sampling',
+        warm_start: Optional[Union[StanModelBase, str]] = None,
+        **kwargs
+    ) -> StanModelBase:
+        """
+        Fit the model with Stan, and keep the draws of the parameters.
+        The method is one of
+        - 'sampling': draws from the posterior with NUTS,
+        - 'vb': approximate draws from the posterior with ADVI,
+        - 'optimizing': the posterior mode, kept as a single draw,
+        and kwargs are passed on to the Stan method of that name.
+
+        With marginal, the marginal variant of the model is fit instead,
+        in which per-customer latent variables are integrated out. Its
+        posterior for the parameters is the same, but it has only the
+        parameters to sample, rather than two more per customer. With
+        collapse, which implies marginal, customers with identical rows
+        are also collapsed into a single row with a weight, so that fit
+        time scales with the number of distinct rows, rather than the
+        number of customers.
+
+        With sample_size, which also implies marginal, the model is fit
+        to a stratified sample of about sample_size customers, see
+        stratified_sample, drawn with sample_seed. Sampled customers are
+        weighted by the number of customers they stand for, so that the
+        posterior approximates the one of the full data, at a cost
+        independent of the number of customers. The number of customers
+        the weights add up to is kept in fit_diagnostics.
+
+        With warm_start, a fitted model of the same class or the path of
+        its draws written by to_file, the chains are initialised at
+        draws of its posterior. When sampling, the step size adapted in
+        the fit of warm_start, as recorded in its fit diagnostics, is
+        reused if it sampled the same Stan program, and for marginal
+        fits, the diagonal metric is estimated from its draws. On data
+        that barely changed, this allows for a much shorter warmup,
+        which still has to be passed explicitly.
+
+        Timings and sampler diagnostics of the fit are kept in
+        fit_diagnostics, see FitDiagnostics.
+        """
+        if method not in FIT_METHODS:
+            raise ValueError(f'Unknown fit method "{method}".')
 
-    def fit(self, data: pandas.DataFrame, **kwargs) -> StanModelBase:
-        if self._stan_model is None:
-            self._compile_stan_model()
+        start = perf_counter()
+
+        if marginal or collapse or sample_size is not None:
+            stan_model = self._get_marginal_stan_model()
+            model_name = self.__class__.__marginal_model_name__
+            columns = list(self.__class__.__data_columns__)
+            if sample_size is not None:
+                data = stratified_sample(
+                    data,
+                    sample_size=sample_size,
+                    seed=sample_seed
+                )
+            else:
+                data = data.assign(weight=1.0)
+
+            if collapse:
+                data = collapse_rows(data, columns)
+            data = data[columns + ['weight']]
+            fit_customers = data.weight.sum()
+        else:
+            stan_model = self._get_stan_model()
+            model_name = self.__class__.__model_name__
+            fit_customers = len(data)
+
+        if warm_start is not None:
+            kwargs = self._warm_start_kwargs(
+                warm_start=warm_start,
+                method=method,
+                model_name=model_name,
+                kwargs=kwargs,
+            )
 
         data_dict = {
             **dict(data),
             'N': len(data)
         }
-        fit = self._stan_model.sampling(
-            data=data_dict,
-            **kwargs
+        diagnostics = FitDiagnostics(
+            model_name=model_name,
+            method=method,
+            rows=len(data),
+            customers=float(fit_customers),
+            seconds={'prepare': perf_counter() - start},
         )
+        # only the parameters are kept, and not the per-customer latent
+        # variables, which would take memory proportional to the number
+        # of customers times the number of draws
+        parameters = list(self.__class__.__parameters__)
+        if method == 'sampling':
+            start = perf_counter()
+            fit = stan_model.sampling(
+                data=data_dict,
+                pars=parameters,
+                **kwargs
+            )
+            stan_seconds = perf_counter() - start
+
+            start = perf_counter()
+            posteriors = fit.extract(pars=parameters, permuted=True)
+            diagnostics.add_sampler_diagnostics(
+                fit=fit,
+                parameters=parameters,
+                stan_seconds=stan_seconds,
+                max_treedepth=kwargs.get('control', {}).get(
+                    'max_treedepth',
+                    DEFAULT_MAX_TREEDEPTH
+                )
+            )
+            del fit
+            diagnostics.seconds['extract'] = perf_counter() - start
+        elif method == 'vb':
+            start = perf_counter()
+            results = stan_model.vb(
+                data=data_dict,
+                pars=parameters,
+                **kwargs
+            )
+            diagnostics.seconds['fit'] = perf_counter() - start
+            posteriors = _vb_draws(results)
+        else:
+            start = perf_counter()
+            estimates = stan_model.optimizing(data=data_dict, **kwargs)
+            diagnostics.seconds['fit'] = perf_counter() - start
+            posteriors = {
+                parameter: numpy.atleast_1d(estimates[parameter])
+                for parameter in parameters
+            }
 
-        posteriors = fit.extract(permuted=True)
         for parameter in self.__class__.__parameters__:
             setattr(self, parameter, posteriors[parameter])
+        self._prediction_cache = None
+        diagnostics.finish()
+        self.fit_diagnostics = diagnostics
 
         return self
 
-    def to_file(self, file_path: str) -> None:
-        self._check_fit()
+    def _warm_start_kwargs(
+        self,
+        warm_start: Union[StanModelBase, str],
+        method: str,
+        model_name: str,
+        kwargs: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Stan keyword arguments initialising a fit at the posterior of
+        warm_start. Arguments in kwargs take precedence.
+        """
+        if isinstance(warm_start, str):
+            draws = self.__class__._read_draws(warm_start, memory_map=True)
+            diagnostics = _read_fit_diagnostics(warm_start)
+        else:
+            warm_start._check_fit()
+            draws = {
+                parameter: getattr(warm_start, parameter)
+                for parameter in self.__class__.__parameters__
+            }
+            diagnostics = warm_start.fit_diagnostics
+
+        stepsize = (
+            diagnostics.stepsize
+            if diagnostics is not None and diagnostics.model_name == model_name
+            else None
+        )
 
-        pandas.DataFrame(
-            data={
-                parameter: getattr(self, parameter)
+        if method != 'sampling':
+            return {
+                'init': {
+                    parameter: float(numpy.mean(draws[parameter]))
+                    for parameter in self.__class__.__parameters__
+                },
+                **kwargs
+            }
+
+        # draws are permuted, so any draws are a random sample of the
+        # posterior
+        n_chains = kwargs.get('chains', 4)
+        n_draws = len(draws[self.__class__.__parameters__[0]])
+        init = [
+            {
+                parameter: float(draws[parameter][index])
                 for parameter in self.__class__.__parameters__
             }
-        ).to_csv(file_path, index=False)
+            for index in numpy.arange(n_chains) % n_draws
+        ]
+
+        control = {}
+        if stepsize is not None:
+            control['stepsize'] = stepsize
+        if (
+            model_name == self.__class__.__marginal_model_name__
+            and n_draws > 1
+        ):
+            # all parameters of marginal programs are positive, so they
+            # are log transformed by Stan
+            control['inv_metric'] = numpy.array(
+                [
+                    numpy.var(numpy.log(draws[parameter]))
+                    for parameter in self.__class__.__parameters__
+                ]
+            )
+
+        return {
+            'init': init,
+            **kwargs,
+            'control': {**control, **kwargs.get('control', {})},
+        }
+
+    def to_file(self, file_path: str, file_format: str = 'csv') -> None:
+        """
+        Write the posterior draws to file_path. With file_format 'csv',
+        file_path is a CSV file with a column per parameter. With
+        file_format 'npy', file_path is a directory holding a .npy file
+        per parameter and a small JSON metadata file, which from_file
+        can memory-map. The fit diagnostics, if any, are written next to
+        the draws as JSON.
+        """
+        self._check_fit()
+
+        if file_format not in DRAWS_FILE_FORMATS:
+            raise ValueError(f'Unknown file format "{file_format}".')
+
+        if file_format == 'npy':
+            self._to_npy(file_path)
+        else:
+            self._to_csv(file_path)
+
+        if self.fit_diagnostics is not None:
+            with open(
+                _fit_diagnostics_path(file_path),
+                'w'
+            ) as diagnostics_file:
+                diagnostics_file.write(self.fit_diagnostics.to_json())
+
+    def _to_csv(self, file_path: str) -> None:
+        draws = {
+            parameter: getattr(self, parameter)
+            for parameter in self.__class__.__parameters__
+        }
+        if self.draw_weights is not None:
+            draws['draw_weights'] = self.draw_weights
+        pandas.DataFrame(data=draws).to_csv(file_path, index=False)
+
+    def _to_npy(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        parameters = sorted(self.__class__.__parameters__)
+        if self.draw_weights is not None:
+            parameters.append('draw_weights')
+        for parameter in parameters:
+            numpy.save(
+                os.path.join(directory, f'{parameter}.npy'),
+                numpy.asarray(getattr(self, parameter), dtype=numpy.float64)
+            )
+
+        with open(
+            os.path.join(directory, DRAWS_METADATA_FILE),
+            'w'
+        ) as metadata_file:
+            json.dump(
+                {
+                    'format_version': DRAWS_FORMAT_VERSION,
+                    'model_name': self.__class__.__model_name__,
+                    'parameters': parameters,
+                },
+                metadata_file
+            )
+
+    @classmethod
+    def from_file(
+        cls,
+        file_path: str,
+        memory_map: bool = True,
+        **kwargs
+    ) -> StanModelBase:
+        """
+        Load posterior draws written by to_file, in either format. Draws
+        in the npy format are memory-mapped read-only, unless memory_map
+        is False, so that processes loading the same draws share them
+        through the page cache. Fit diagnostics written next to the
+        draws are loaded into fit_diagnostics.
+        """
+        model = cls(
+            **cls._read_draws(file_path, memory_map=memory_map),
+            **kwargs
+        )
+        model.fit_diagnostics = _read_fit_diagnostics(file_path)
+
+        return model
 
     @classmethod
-    def from_file(cls, file_path: str, **kwargs) -> StanModelBase:
+    def _read_draws(
+        cls,
+        file_path: str,
+        memory_map: bool
+    ) -> Dict[str, numpy.ndarray]:
+        if os.path.isdir(file_path):
+            return cls._read_npy_draws(file_path, memory_map=memory_map)
+
         parameters_df = pandas.read_csv(file_path)
 
-        return cls(
+        return {
+            parameter: parameters_df[parameter].values
+            for parameter in cls.__parameters__ + ('draw_weights',)
+            if parameter in parameters_df
+        }
+
+    @classmethod
+    def _read_npy_draws(
+        cls,
+        directory: str,
+        memory_map: bool
+    ) -> Dict[str, numpy.ndarray]:
+        with open(
+            os.path.join(directory, DRAWS_METADATA_FILE)
+        ) as metadata_file:
+            metadata = json.load(metadata_file)
+        model_name = metadata['model_name']
+
+        if model_name != cls.__model_name__:
+            raise ValueError(
+                f'Draws in "{directory}" are of model "{model_name}", '
+                f'not "{cls.__model_name__}".'
+            )
+
+        return {
+            parameter: numpy.load(
+                os.path.join(directory, f'{parameter}.npy'),
+                mmap_mode='r' if memory_map else None
+            )
+            for parameter in metadata['parameters']
+        }
+
+    def posterior_mean(self) -> StanModelBase:
+        self._check_fit()
+
+        return replace(
+            self,
             **{
-                parameter: parameters_df[parameter].values
-                for parameter in cls.__parameters__
+                parameter: numpy.atleast_1d(
+                    numpy.average(
+                        getattr(self, parameter),
+                        weights=self.draw_weights
+                    )
+                )
+                for parameter in self.__class__.__parameters__
             },
-            **kwargs
+            draw_weights=None
         )
 
-    def posterior_mean(self) -> StanModelBase:
+    def compress(
+        self,
+        n_points: int,
+        method: str = 'herding',
+        seed: Optional[int] = None
+    ) -> StanModelBase:
+        """
+        A copy of the model with its draws reduced to at most n_points
+        weighted draws, which represent the posterior well enough for
+        prediction at a fraction of the cost. See compress_draws for
+        the methods.
+        """
         self._check_fit()
 
-        return self.__class__(
+        if self.draw_weights is not None:
+            raise ValueError('Draws are already compressed.')
+
+        indices, weights = compress_draws(
+            draws=numpy.column_stack(
+                [
+                    getattr(self, parameter)
+                    for parameter in self.__class__.__parameters__
+                ]
+            ),
+            n_points=n_points,
+            method=method,
+            seed=seed,
+        )
+
+        return replace(
+            self,
             **{
-                parameter: getattr(self, parameter).mean(keepdims=True)
+                parameter: numpy.asarray(getattr(self, parameter))[indices]
                 for parameter in self.__class__.__parameters__
-            }
+            },
+            draw_weights=weights
+        )
+
+    def _posterior_average(self, values: numpy.ndarray) -> numpy.ndarray:
+        """
+        Average values, with a column per draw, over the draws. This
+        also holds for no rows, for which numpy.average raises.
+        """
+        if self.draw_weights is None:
+            return values.mean(axis=1)
+
+        weights = self.draw_weights.astype(values.dtype)
+        return values @ (weights / weights.sum())
+
+    def _predict_rows(
+        self,
+        predict_chunk: Callable[..., numpy.ndarray],
+        key: Hashable,
+        *columns: numpy.ndarray
+    ) -> numpy.ndarray:
+        """
+        _predict_in_chunks, computed once per distinct row of columns,
+        as customers with the same row have the same prediction.
+
+        With prediction_cache_size, the predictions of up to that many
+        distinct rows are kept in a least recently used cache of the
+        model, under key and prediction_dtype, which key has to set
+        apart predictions with different predict_chunk or arguments,
+        such as periods. Repeated predictions then only compute rows
+        that are not cached. The cache is emptied by fit, but not if
+        the draws are changed otherwise.
+        """
+        unique_columns, inverse = unique_rows(*columns)
+        if self.prediction_cache_size == 0:
+            return self._predict_in_chunks(
+                predict_chunk,
+                *unique_columns
+            )[inverse]
+
+        if self._prediction_cache is None:
+            self._prediction_cache = OrderedDict()
+        cache = self._prediction_cache
+
+        keys = [
+            (key, self.prediction_dtype, *row)
+            for row in zip(*(column.tolist() for column in unique_columns))
+        ]
+        missing = numpy.array(
+            [
+                index
+                for index, row_key in enumerate(keys)
+                if row_key not in cache
+            ],
+            dtype=numpy.int64
+        )
+        computed = self._predict_in_chunks(
+            predict_chunk,
+            *(column[missing] for column in unique_columns)
         )
 
+        predictions = numpy.empty(len(keys), dtype=computed.dtype)
+        predictions[missing] = computed
+        for index, row_key in enumerate(keys):
+            if row_key in cache:
+                cache.move_to_end(row_key)
+                predictions[index] = cache[row_key]
+        for index, prediction in zip(missing, computed):
+            cache[keys[index]] = prediction
+        while len(cache) > self.prediction_cache_size:
+            cache.popitem(last=False)
 
-def _load_stan_model(model_name: str) -> Optional[pystan.StanModel]:
+        return predictions[inverse]
+
+    def _predict_in_chunks(
+        self,
+        predict_chunk: Callable[..., numpy.ndarray],
+        *columns: numpy.ndarray
+    ) -> numpy.ndarray:
+        """
+        Apply predict_chunk to consecutive chunks of rows of columns,
+        each reshaped to a single column, and concatenate its results, a
+        value per row. Chunks are sized for the arrays with a column per
+        draw to stay within prediction_memory_limit, so that peak memory
+        does not depend on the number of rows. As every row is predicted
+        on its own, the results are the same as for a single chunk.
+        predict_chunk has to return values in prediction_dtype.
+        """
+        n_draws = len(getattr(self, self.__class__.__parameters__[0]))
+        chunk_size = max(
+            1,
+            self.prediction_memory_limit // (
+                PREDICTION_TEMPORARIES
+                * n_draws
+                * numpy.dtype(self.prediction_dtype).itemsize
+            )
+        )
+        n_rows = len(columns[0])
+        if n_rows == 0:
+            return numpy.empty(0, dtype=self.prediction_dtype)
+
+        return numpy.concatenate(
+            [
+                predict_chunk(
+                    *(
+                        numpy.asarray(column)[start:start + chunk_size]
+                        .reshape(-1, 1)
+                        for column in columns
+                    )
+                )
+                for start in range(0, n_rows, chunk_size)
+            ]
+        )
+
+    def _prediction_draws(self) -> Dict[str, numpy.ndarray]:
+        """
+        Draws of the parameters, in prediction_dtype.
+        """
+        return {
+            parameter: numpy.asarray(
+                getattr(self, parameter),
+                dtype=self.prediction_dtype
+            )
+            for parameter in self.__class__.__parameters__
+        }
+
+
+def unique_rows(
+    *columns: numpy.ndarray
+) -> Tuple[List[numpy.ndarray], numpy.ndarray]:
+    """
+    Distinct rows of columns, as a list of columns in order of first
+    appearance, and for every row the index of its distinct row. The
+    columns are flattened, and keep their dtypes, which may differ and
+    include object.
+    """
+    columns = tuple(numpy.asarray(column).reshape(-1) for column in columns)
+    if len(columns[0]) == 0:
+        return list(columns), numpy.zeros(0, dtype=numpy.int64)
+
+    frame = pandas.DataFrame(dict(enumerate(columns)), copy=False)
+    groups = frame.groupby(list(frame.columns), sort=False, dropna=False)
+    unique = groups.head(1)
+
+    return (
+        [unique[name].to_numpy() for name in frame.columns],
+        groups.ngroup().to_numpy()
+    )
+
+
+def _fit_diagnostics_path(file_path: str) -> str:
+    if os.path.isdir(file_path):
+        return os.path.join(file_path, FIT_DIAGNOSTICS_FILE)
+
+    return f'{file_path}{FIT_DIAGNOSTICS_SUFFIX}'
+
+
+def _read_fit_diagnostics(file_path: str) -> Optional[FitDiagnostics]:
     try:
-        with resources.open_binary(
-            STAN_MODELS_PACKAGE,
-            f'{model_name}.pkl'
-        ) as model_file:
-            model = pickle.load(model_file)
+        with open(_fit_diagnostics_path(file_path)) as diagnostics_file:
+            return FitDiagnostics.from_json(diagnostics_file.read())
     except FileNotFoundError:
-        model = None
+        return None
+
+
+def _vb_draws(results: Dict[str, Any]) -> Dict[str, numpy.ndarray]:
+    return {
+        parameter: numpy.asarray(draws, dtype=numpy.float64)
+        for parameter, draws in zip(
+            results['sampler_param_names'],
+            results['sampler_params']
+        )
+    }
+
+
+def collapse_rows(
+    data: pandas.DataFrame,
+    columns: Sequence[str]
+) -> pandas.DataFrame:
+    """
+    Collapse rows of data with the same values in columns into a single
+    row, with a column weight holding the number of rows collapsed, or
+    the sum of their weights if data has a weight column. Rows are in
+    order of first appearance.
+    """
+    if 'weight' not in data.columns:
+        data = data.assign(weight=1.0)
+
+    return (
+        data
+        .groupby(list(columns), sort=False)
+        .weight
+        .sum()
+        .reset_index()
+    )
+
+
+def stratified_sample(
+    data: pandas.DataFrame,
+    sample_size: int,
+    columns: Sequence[str] = ('frequency', 'T'),
+    n_buckets: int = 10,
+    seed: Optional[int] = None
+) -> pandas.DataFrame:
+    """
+    Sample about sample_size rows of data, stratified by quantile
+    buckets of each of columns, with a column weight holding the number
+    of rows of its stratum each sampled row stands for. The weights add
+    up to the number of rows of data.
+
+    Rows are allocated to strata in proportion to their size, with at
+    least one row per stratum, so the sample exceeds sample_size if
+    there are more strata than that.
+    """
+    if sample_size < 1:
+        raise ValueError('Sample size must be a positive integer.')
+
+    if sample_size >= len(data):
+        return data.assign(weight=1.0)
+
+    strata = data.groupby(
+        [
+            pandas.qcut(
+                data[column],
+                n_buckets,
+                labels=False,
+                duplicates='drop'
+            ).values
+            for column in columns
+        ],
+        sort=False
+    ).indices
+    rows = list(strata.values())
+    sizes = numpy.array([len(stratum_rows) for stratum_rows in rows])
+
+    # largest remainder allocation of sample_size to strata
+    quotas = sizes * sample_size / len(data)
+    allocation = numpy.floor(quotas).astype(numpy.int64)
+    remainder = sample_size - allocation.sum()
+    allocation[
+        numpy.argsort(allocation - quotas, kind='stable')[:remainder]
+    ] += 1
+    allocation = numpy.clip(allocation, 1, sizes)
+
+    random_state = numpy.random.RandomState(seed)
+    sampled = [
+        random_state.choice(stratum_rows, size=size, replace=False)
+        for stratum_rows, size in zip(rows, allocation)
+    ]
 
-    return model
+    return data.iloc[numpy.concatenate(sampled)].assign(
+        weight=numpy.repeat(sizes / allocation, allocation)
+    )
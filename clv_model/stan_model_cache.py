@@ -0,0 +1,135 @@
+from __future__ import annotations
+from hashlib import sha256
+from importlib import resources
+import os
+import pickle
+import platform
+import sysconfig
+import tempfile
+from typing import List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pystan
+
+__all__ = (
+    'cache_directory',
+    'cached_model_path',
+    'compile_stan_model',
+    'get_stan_model',
+    'is_cached',
+    'load_cached_stan_model',
+    'stan_model_hash',
+    'stan_model_names',
+)
+
+STAN_MODELS_PACKAGE = 'clv_model.stan_models'
+CACHE_DIRECTORY_VARIABLE = 'CLV_MODEL_STAN_CACHE'
+
+
+def cache_directory() -> str:
+    """
+    Directory compiled models are cached in. This is the directory in
+    the environment variable CLV_MODEL_STAN_CACHE if it is set, and the
+    directory holding the Stan programs otherwise.
+    """
+    directory = os.environ.get(CACHE_DIRECTORY_VARIABLE)
+    if directory:
+        return directory
+
+    with resources.path(STAN_MODELS_PACKAGE, '__init__.py') as path:
+        return str(path.parent)
+
+
+def stan_model_names() -> List[str]:
+    return sorted(
+        os.path.splitext(file_)[0]
+        for file_ in resources.contents(STAN_MODELS_PACKAGE)
+        if os.path.splitext(file_)[1] == '.stan'
+    )
+
+
+def stan_model_hash(model_name: str) -> str:
+    """
+    Hash of the Stan program together with everything the compiled
+    model depends on: the pystan and Python versions, the platform and
+    the C compiler.
+    """
+    import pystan
+
+    source = resources.read_text(STAN_MODELS_PACKAGE, f'{model_name}.stan')
+    toolchain = '\n'.join(
+        [
+            pystan.__version__,
+            platform.python_version(),
+            platform.machine(),
+            str(sysconfig.get_config_var('CC')),
+        ]
+    )
+
+    return sha256(f'{source}\n{toolchain}'.encode()).hexdigest()[:16]
+
+
+def cached_model_path(model_name: str) -> str:
+    return os.path.join(
+        cache_directory(),
+        f'{model_name}-{stan_model_hash(model_name)}.pkl'
+    )
+
+
+def is_cached(model_name: str) -> bool:
+    return os.path.isfile(cached_model_path(model_name))
+
+
+def load_cached_stan_model(model_name: str) -> Optional[pystan.StanModel]:
+    try:
+        with open(cached_model_path(model_name), 'rb') as model_file:
+            return pickle.load(model_file)
+    except FileNotFoundError:
+        return None
+
+
+def compile_stan_model(model_name: str) -> pystan.StanModel:
+    """
+    Compile the Stan program, and write it to the cache, replacing
+    compiled versions of earlier revisions of the program.
+    """
+    import pystan
+
+    model_code = resources.read_text(
+        STAN_MODELS_PACKAGE,
+        f'{model_name}.stan'
+    )
+    model = pystan.StanModel(model_code=model_code, model_name=model_name)
+
+    model_path = cached_model_path(model_name)
+    directory = os.path.dirname(model_path)
+    os.makedirs(directory, exist_ok=True)
+
+    # write to a temporary file first, so that concurrent readers never
+    # see a partially written model
+    file_descriptor, temporary_path = tempfile.mkstemp(
+        dir=directory,
+        suffix='.tmp'
+    )
+    with os.fdopen(file_descriptor, 'wb') as model_file:
+        pickle.dump(model, model_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, model_path)
+
+    for file_ in os.listdir(directory):
+        path = os.path.join(directory, file_)
+        if (
+            file_.startswith(f'{model_name}-')
+            and file_.endswith('.pkl')
+            and path != model_path
+        ):
+            os.remove(path)
+
+    return model
+
+
+def get_stan_model(model_name: str) -> pystan.StanModel:
+    model = load_cached_stan_model(model_name)
+    if model is None:
+        model = compile_stan_model(model_name)
+
+    return model
@@ -1,3 +1,6 @@
+from functools import partial
+
+import numpy
 import pandas
 
 from ..stan_model_base import Parameter, StanModelBase
@@ -9,7 +12,9 @@ __all__ = ('BetaGeometricNBD',)
 class BetaGeometricNBD(
     StanModelBase,
     TransactionsModel,
-    model_name='beta_geometric_nbd'
+    model_name='beta_geometric_nbd',
+    marginal_model_name='beta_geometric_nbd_marginal',
+    data_columns=('frequency', 'recency', 'T')
 ):
     lambda_shape: Parameter
     lambda_rate: Parameter
@@ -21,4 +26,106 @@ class BetaGeometricNBD(
         data: pandas.DataFrame,
         periods: int
     ) -> pandas.DataFrame:
-        raise NotImplementedError('Predict method is not yet implemented.')
+        """
+        Predictions are computed once per distinct row of frequency,
+        recency and T, in chunks sized after prediction_memory_limit,
+        and cached with prediction_cache_size, see _predict_rows.
+
+        Expected transactions are only defined for alpha above one, and
+        frequency is the number of transactions, as in the Stan
+        programs, so it is at least one.
+        """
+        self._check_fit()
+
+        purchases_after_observation = self._predict_rows(
+            partial(self._expected_transactions, periods=periods),
+            ('transactions', periods),
+            data.frequency.values,
+            data.recency.values,
+            data['T'].values
+        )
+
+        return pandas.DataFrame(
+            data={
+                'id': data.id,
+                'transactions': purchases_after_observation.astype(
+                    numpy.float64
+                )
+            }
+        )
+
+    def _expected_transactions(
+        self,
+        frequency: numpy.ndarray,
+        recency: numpy.ndarray,
+        observation_period: numpy.ndarray,
+        periods: int
+    ) -> numpy.ndarray:
+        from scipy.special import hyp2f1
+
+        dtype = self.prediction_dtype
+        draws = self._prediction_draws()
+        frequency = frequency.astype(dtype)
+        observation_period = observation_period.astype(dtype)
+
+        probalive = self.probability_alive(
+            frequency=frequency,
+            recency=recency.astype(dtype),
+            observation_period=observation_period
+        )
+
+        # posterior mean of expected purchases after observation period
+        # ends, equation (10) in
+        # https://www.brucehardie.com/papers/bgnbd_2004-04-20.pdf
+        z = periods / (draws['lambda_rate'] + observation_period + periods)
+        churn_shape = draws['alpha'] + draws['beta'] + frequency - 1
+        # 1 - (1 - z)**(lambda_shape + frequency) * hyp2f1(...), with
+        # Euler's transformation of hyp2f1, whose parameters then do not
+        # grow with frequency, so that it does not overflow
+        hypergeometric_term = 1 - (1 - z) ** (draws['alpha'] - 1) * hyp2f1(
+            draws['alpha'] + draws['beta'] - 1 - draws['lambda_shape'],
+            draws['alpha'] - 1,
+            churn_shape,
+            z
+        )
+
+        return self._posterior_average(
+            probalive
+            * churn_shape
+            / (draws['alpha'] - 1)
+            * hypergeometric_term
+        )
+
+    def probability_alive(
+        self,
+        frequency: numpy.ndarray,
+        recency: numpy.ndarray,
+        observation_period: numpy.ndarray,
+    ) -> numpy.ndarray:
+        """
+        P(alive) per draw, equation (13) in the BG/NBD paper, computed
+        from the log of the odds of having churned, which does not
+        overflow for customers with many transactions.
+        """
+        from scipy.special import expit
+
+        self._check_fit()
+
+        dtype = self.prediction_dtype
+        draws = self._prediction_draws()
+        frequency = numpy.asarray(frequency, dtype)
+        log_odds = (
+            numpy.log(draws['alpha'] / (draws['beta'] + frequency - 1))
+            + (draws['lambda_shape'] + frequency)
+            * (
+                numpy.log(
+                    draws['lambda_rate']
+                    + numpy.asarray(observation_period, dtype)
+                )
+                - numpy.log(
+                    draws['lambda_rate'] + numpy.asarray(recency, dtype)
+                )
+            )
+        )
+
+        return expit(-log_odds)
@@ -0,0 +1,208 @@
+from importlib.util import find_spec
+from typing import Callable, Optional
+
+import numpy
+
+__all__ = (
+    'expected_transactions',
+    'numba_available',
+)
+
+# terms of the 2F1 series summed at most, as in the marginal Pareto/NBD
+# Stan program, beyond which the series is taken not to converge
+MAX_HYPERGEOMETRIC_TERMS = 1_000_000
+# kernel compiled on first use, see _compile_kernel
+_kernel: Optional[Callable[..., numpy.ndarray]] = None
+
+
+def numba_available() -> bool:
+    return find_spec('numba') is not None
+
+
+def expected_transactions(
+    frequency: numpy.ndarray,
+    recency: numpy.ndarray,
+    observation_period: numpy.ndarray,
+    lambda_shape: numpy.ndarray,
+    lambda_rate: numpy.ndarray,
+    mu_shape: numpy.ndarray,
+    mu_rate: numpy.ndarray,
+    weights: numpy.ndarray,
+    periods: int
+) -> numpy.ndarray:
+    """
+    Posterior average, with weights per draw, of the expected number of
+    transactions in periods after the observation period, per customer.
+    This is the same as ParetoNBD predicts, in a single pass per
+    customer over the draws, with P(alive) computed in log space as in
+    ParetoNBD._probability_alive_log_space, and customers in parallel.
+    Customers for which the 2F1 series does not converge within
+    MAX_HYPERGEOMETRIC_TERMS terms get nan. Requires numba, and compiles
+    the kernel on first use.
+    """
+    global _kernel
+
+    if _kernel is None:
+        _kernel = _compile_kernel()
+
+    def as_float64(values: numpy.ndarray) -> numpy.ndarray:
+        return numpy.ascontiguousarray(
+            numpy.asarray(values, dtype=numpy.float64).reshape(-1)
+        )
+
+    return _kernel(
+        as_float64(frequency),
+        as_float64(recency),
+        as_float64(observation_period),
+        as_float64(lambda_shape),
+        as_float64(lambda_rate),
+        as_float64(mu_shape),
+        as_float64(mu_rate),
+        as_float64(weights),
+        float(periods),
+    )
+
+
+def _compile_kernel() -> Callable[..., numpy.ndarray]:
+    try:
+        import numba
+    except ImportError as error:
+        raise ImportError(
+            'The numba prediction backend requires numba to be installed.'
+        ) from error
+
+    @numba.njit
+    def log_hypergeometric_2f1(
+        a: float,
+        b: float,
+        c: float,
+        z: float
+    ) -> float:
+        # log of 2F1(a, b; c; z), for positive a, b and c, and z in
+        # [0, 1), summing the series with the sum and term rescaled
+        # whenever the sum gets large, as terms can overflow, and nan if
+        # it does not converge within MAX_HYPERGEOMETRIC_TERMS terms
+        if z == 0:
+            return 0.0
+        # the series diverges otherwise, which includes z being nan
+        if not 0 < z < 1:
+            return numpy.nan
+
+        log_scale = 0.0
+        term = 1.0
+        total = 1.0
+        k = 0
+        while k < MAX_HYPERGEOMETRIC_TERMS:
+            term *= (a + k) * (b + k) / ((c + k) * (k + 1)) * z
+            total += term
+            k += 1
+            if total > 1e100:
+                log_scale += numpy.log(total)
+                term /= total
+                total = 1.0
+            # stop once terms are negligible and decreasing
+            if (
+                term < total * 1e-17
+                and (a + k) * (b + k) * z < (c + k) * (k + 1)
+            ):
+                return log_scale + numpy.log(total)
+
+        return numpy.nan
+
+    @numba.njit
+    def draw_expected_transactions(
+        frequency: float,
+        recency: float,
+        observation_period: float,
+        lambda_shape: float,
+        lambda_rate: float,
+        mu_shape: float,
+        mu_rate: float,
+        periods: float
+    ) -> float:
+        rate = max(lambda_rate, mu_rate)
+        if lambda_rate >= mu_rate:
+            middle_hypergeom_arg = mu_shape + 1
+        else:
+            middle_hypergeom_arg = lambda_shape + frequency
+        shape_frequency = lambda_shape + frequency
+        denom_exponent = shape_frequency + mu_shape
+        abs_diff = abs(lambda_rate - mu_rate)
+        lambda_rate_t = lambda_rate + observation_period
+        mu_rate_t = mu_rate + observation_period
+
+        # the customer cannot have churned between the last transaction
+        # and the end of the observation period
+        if recency >= observation_period:
+            probability_alive = 1.0
+        else:
+            log_term_recency = (
+                log_hypergeometric_2f1(
+                    denom_exponent,
+                    middle_hypergeom_arg,
+                    denom_exponent + 1,
+                    abs_diff / (rate + recency)
+                )
+                - denom_exponent * numpy.log(rate + recency)
+            )
+            log_term_observation_period = (
+                log_hypergeometric_2f1(
+                    denom_exponent,
+                    middle_hypergeom_arg,
+                    denom_exponent + 1,
+                    abs_diff / (rate + observation_period)
+                )
+                - denom_exponent * numpy.log(rate + observation_period)
+            )
+            log_a_0 = log_term_recency + numpy.log1p(
+                -numpy.exp(log_term_observation_period - log_term_recency)
+            )
+            # log of the odds of having churned
+            log_odds = (
+                numpy.log(mu_shape / denom_exponent)
+                + log_a_0
+                + shape_frequency * numpy.log(lambda_rate_t)
+                + mu_shape * numpy.log(mu_rate_t)
+            )
+            probability_alive = 1 / (1 + numpy.exp(log_odds))
+
+        return (
+            probability_alive
+            * shape_frequency
+            * mu_rate_t
+            / (lambda_rate_t * (mu_shape - 1))
+            * -numpy.expm1(-(mu_shape - 1) * numpy.log1p(periods / mu_rate_t))
+        )
+
+    @numba.njit(parallel=True)
+    def kernel(
+        frequency: numpy.ndarray,
+        recency: numpy.ndarray,
+        observation_period: numpy.ndarray,
+        lambda_shape: numpy.ndarray,
+        lambda_rate: numpy.ndarray,
+        mu_shape: numpy.ndarray,
+        mu_rate: numpy.ndarray,
+        weights: numpy.ndarray,
+        periods: float
+    ) -> numpy.ndarray:
+        total_weight = weights.sum()
+        result = numpy.empty(len(frequency))
+        for customer in numba.prange(len(frequency)):
+            weighted_sum = 0.0
+            for draw in range(len(lambda_shape)):
+                weighted_sum += weights[draw] * draw_expected_transactions(
+                    frequency[customer],
+                    recency[customer],
+                    observation_period[customer],
+                    lambda_shape[draw],
+                    lambda_rate[draw],
+                    mu_shape[draw],
+                    mu_rate[draw],
+                    periods
+                )
+            result[customer] = weighted_sum / total_weight
+
+        return result
+
+    return kernel
@@ -33,6 +33,9 @@ class TransactionsModel(ABC):
         T is the number of periods the customer has been observed for.
         This method should then predict the number of transactions
         occurring in the interval (T, T + periods].
+        The result should have columns ('id', 'transactions'), with a
+        row per row of `data`, in the same order, as CLVModel combines
+        predictions by position.
         """
         ...
 
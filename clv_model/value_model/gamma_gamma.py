@@ -1,5 +1,6 @@
 from logging import Logger
 
+import numpy
 import pandas
 
 from ..stan_model_base import Parameter, StanModelBase
@@ -25,22 +26,44 @@ class GammaGamma(StanModelBase, ValueModel, model_name='gamma_gamma'):
                 'using the model.'
             )
 
-        freq = data.frequency.values.reshape(-1, 1)
-        val = data.value.values.reshape(-1, 1)
-
-        # Posterior mean of E_{p, q, mu}(value | frequency, mean_value).
-        # This is equation (5) in
-        # https://www.brucehardie.com/notes/025/gamma_gamma.pdf
-        expected_value = (
-            self.p * (self.mu + freq * val) / (self.p * freq + self.q - 1)
-        ).mean(1)
+        expected_value = self._predict_rows(
+            self._expected_value,
+            'value',
+            data.frequency.values,
+            data.value.values
+        )
 
         return (
             pandas.DataFrame(
                 data={
                     'id': data.id,
-                    'value': expected_value
+                    # float64, or object for object input, as the
+                    # arithmetic on the input would give
+                    'value': expected_value.astype(
+                        numpy.result_type(data.value.dtype, numpy.float64),
+                        copy=False
+                    )
                 }
             )
             .round({'value': 2})
         )
+
+    def _expected_value(
+        self,
+        frequency: numpy.ndarray,
+        value: numpy.ndarray
+    ) -> numpy.ndarray:
+        # with prediction_dtype float32, values are within a cent of the
+        # ones computed in float64
+        dtype = self.prediction_dtype
+        draws = self._prediction_draws()
+        freq = frequency.astype(dtype, copy=False)
+        val = value.astype(dtype, copy=False)
+
+        # Posterior mean of E_{p, q, mu}(value | frequency, mean_value).
+        # This is equation (5) in
+        # https://www.brucehardie.com/notes/025/gamma_gamma.pdf
+        return self._posterior_average(
+            draws['p'] * (draws['mu'] + freq * val)
+            / (draws['p'] * freq + draws['q'] - 1)
+        )
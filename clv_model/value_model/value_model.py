@@ -19,6 +19,12 @@ class ValueModel(ABC):
 
     @abstractmethod
     def predict(self, data: pandas.DataFrame) -> pandas.DataFrame:
+        """
+        Should predict the average value of the customer's future
+        purchases. The result should have columns ('id', 'value'), with
+        a row per row of `data`, in the same order, as CLVModel combines
+        predictions by position.
+        """
         ...
 
     def _check_fit(self) -> None:
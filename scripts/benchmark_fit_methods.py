@@ -0,0 +1,52 @@
+from argparse import ArgumentParser
+import sys
+from time import perf_counter
+
+sys.path.append('/app')
+from synthetic_data import synthetic_rfm  # noqa: E402
+from clv_model.stan_model_base import FIT_METHODS  # noqa: E402
+from clv_model.transactions_model import ParetoNBD  # noqa: E402
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(
+        description=(
+            'Compare fit time and predictions of the Stan fit methods of '
+            'the Pareto/NBD model.'
+        )
+    )
+    parser.add_argument('--customers', type=int, default=10_000)
+    parser.add_argument('--observation-period', type=int, default=365)
+    parser.add_argument('--periods', type=int, default=90)
+    parser.add_argument('--marginal', action='store_true')
+    parser.add_argument('--collapse', action='store_true')
+    parser.add_argument('--sample-size', type=int)
+    args = parser.parse_args()
+
+    data = synthetic_rfm(args.customers, args.observation_period)
+    print(f'{len(data)} customers with repeat transactions')
+
+    predictions = {}
+    for method in FIT_METHODS:
+        start = perf_counter()
+        model = ParetoNBD().fit(
+            data,
+            marginal=args.marginal,
+            collapse=args.collapse,
+            sample_size=args.sample_size,
+            method=method
+        )
+        seconds = perf_counter() - start
+        predictions[method] = model.predict(data, args.periods).transactions
+        print(f'{method:>10}: {seconds:.1f}s')
+
+    reference = predictions['sampling']
+    for method in FIT_METHODS[1:]:
+        relative_error = (
+            (predictions[method] - reference).abs() / reference
+        )
+        print(
+            f'{method:>10} vs sampling: '
+            f'median relative error {relative_error.median():.4f}, '
+            f'maximum {relative_error.max():.4f}'
+        )
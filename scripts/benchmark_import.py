@@ -0,0 +1,40 @@
+from argparse import ArgumentParser
+import subprocess
+import sys
+from time import perf_counter
+
+MODULES = (
+    'clv_model.data_wrangling.rfm',
+    'clv_model.transactions_model',
+    'clv_model.value_model',
+    'clv_model.clv_model',
+)
+
+
+def time_import(module: str, repeats: int) -> float:
+    # every import runs in a fresh interpreter, so that nothing is cached
+    timings = []
+    for _ in range(repeats):
+        start = perf_counter()
+        subprocess.run(
+            [sys.executable, '-c', f'import {module}'],
+            check=True,
+            cwd='/app',
+        )
+        timings.append(perf_counter() - start)
+
+    return min(timings)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(
+        description='Time importing the clv_model modules in a new process.'
+    )
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    baseline = time_import('sys', args.repeats)
+    print(f'{"interpreter start":>32}: {baseline:.3f}s')
+    for module in MODULES:
+        seconds = time_import(module, args.repeats) - baseline
+        print(f'{module:>32}: {seconds:.3f}s')
@@ -0,0 +1,83 @@
+from argparse import ArgumentParser
+import sys
+from time import perf_counter
+
+import numpy
+
+sys.path.append('/app')
+from synthetic_data import (  # noqa: E402
+    ignoring_overflow,
+    pareto_nbd_draws,
+    synthetic_rfm,
+)
+from clv_model.transactions_model import ParetoNBD  # noqa: E402
+from clv_model.transactions_model.pareto_nbd import (  # noqa: E402
+    PREDICTION_BACKENDS,
+)
+from clv_model.transactions_model.pareto_nbd_numba import (  # noqa: E402
+    numba_available,
+)
+
+if __name__ == '__main__':
+    parser = ArgumentParser(
+        description=(
+            'Time ParetoNBD predictions with the numpy and numba backends, '
+            'and report how far they differ.'
+        )
+    )
+    parser.add_argument('--customers', type=int, default=100_000)
+    parser.add_argument('--draws', type=int, default=1000)
+    parser.add_argument('--periods', type=int, default=90)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    data = synthetic_rfm(args.customers, observation_period=365)
+    draws = pareto_nbd_draws(args.draws)
+    print(
+        f'{len(data)} customers, '
+        f'{len(data[["frequency", "recency", "T"]].drop_duplicates())} '
+        f'distinct, {args.draws} draws'
+    )
+
+    backends = [
+        backend
+        for backend in PREDICTION_BACKENDS
+        if backend != 'auto' and (backend != 'numba' or numba_available())
+    ]
+    predictions = {}
+    with ignoring_overflow():
+        for backend in backends:
+            model = ParetoNBD(**draws, prediction_backend=backend)
+            # the first prediction compiles the numba kernel
+            start = perf_counter()
+            predictions[backend] = (
+                model.predict(data, args.periods).transactions
+            )
+            first_seconds = perf_counter() - start
+
+            timings = []
+            for _ in range(args.repeats):
+                start = perf_counter()
+                model.predict(data, args.periods)
+                timings.append(perf_counter() - start)
+            seconds = min(timings)
+            print(
+                f'{backend:>6}: {seconds:.2f}s, '
+                f'{len(data) / seconds:,.0f} customers/s, '
+                f'first call {first_seconds:.2f}s'
+            )
+
+    if 'numba' in predictions:
+        # customers without finite numpy predictions are left out of the
+        # differences
+        finite = numpy.isfinite(predictions['numpy'])
+        difference = (
+            (predictions['numba'] - predictions['numpy']).abs()
+            / predictions['numpy'].abs()
+        )[finite]
+        print(
+            f'max relative difference {difference.max():.2e}, '
+            f'{(~finite).sum()} customers without finite numpy predictions'
+        )
+    else:
+        print('numba is not installed.')
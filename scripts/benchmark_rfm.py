@@ -0,0 +1,92 @@
+from argparse import ArgumentParser
+import sys
+from time import perf_counter
+
+import numpy
+import pandas
+
+sys.path.append('/app')
+from clv_model.data_wrangling.rfm import ENGINES, rfm  # noqa: E402
+
+
+def synthetic_transactions(
+    n_transactions: int,
+    n_customers: int,
+    seed: int = 0
+) -> pandas.DataFrame:
+    random_state = numpy.random.RandomState(seed)
+    return pandas.DataFrame(
+        data={
+            'customer_id': random_state.randint(
+                n_customers,
+                size=n_transactions
+            ),
+            'order_date': (
+                pandas.Timestamp('2018-01-01')
+                + pandas.to_timedelta(
+                    random_state.randint(3 * 365, size=n_transactions),
+                    unit='D'
+                )
+            ),
+            'value': random_state.gamma(2, 20, size=n_transactions).round(2),
+        }
+    )
+
+
+def time_engine(
+    transactions: pandas.DataFrame,
+    engine: str,
+    period: str,
+    repeats: int,
+    n_jobs: int = 1
+) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = perf_counter()
+        rfm(
+            transactions=transactions,
+            customer_id_col='customer_id',
+            date_col='order_date',
+            value_col='value',
+            period=period,
+            engine=engine,
+            n_jobs=n_jobs,
+        )
+        timings.append(perf_counter() - start)
+
+    return min(timings)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Compare the rfm engines.')
+    parser.add_argument('--transactions', type=int, default=1_000_000)
+    parser.add_argument('--customers', type=int, default=100_000)
+    parser.add_argument('--period', default='D')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--jobs', type=int, nargs='*', default=[2, 4, 8])
+    args = parser.parse_args()
+
+    transactions = synthetic_transactions(args.transactions, args.customers)
+    print(
+        f'{args.transactions} transactions, {args.customers} customers, '
+        f'period {args.period}'
+    )
+    for engine in ENGINES:
+        seconds = time_engine(
+            transactions=transactions,
+            engine=engine,
+            period=args.period,
+            repeats=args.repeats,
+        )
+        print(f'{engine:>8}: {seconds:.3f}s')
+
+    for engine in ENGINES:
+        for n_jobs in args.jobs:
+            seconds = time_engine(
+                transactions=transactions,
+                engine=engine,
+                period=args.period,
+                repeats=args.repeats,
+                n_jobs=n_jobs,
+            )
+            print(f'{engine:>8} with {n_jobs} jobs: {seconds:.3f}s')
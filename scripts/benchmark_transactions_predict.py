@@ -0,0 +1,70 @@
+from argparse import ArgumentParser
+import sys
+from time import perf_counter
+
+import numpy
+
+sys.path.append('/app')
+from synthetic_data import (  # noqa: E402
+    ignoring_overflow,
+    pareto_nbd_draws,
+    synthetic_draws,
+    synthetic_rfm,
+)
+from clv_model.transactions_model import (  # noqa: E402
+    BetaGeometricNBD,
+    ParetoNBD,
+)
+
+if __name__ == '__main__':
+    parser = ArgumentParser(
+        description=(
+            'Time predictions of BetaGeometricNBD against ParetoNBD, with '
+            'the numpy backend, on the same customers.'
+        )
+    )
+    parser.add_argument('--customers', type=int, default=100_000)
+    parser.add_argument('--draws', type=int, default=1000)
+    parser.add_argument('--periods', type=int, default=90)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    data = synthetic_rfm(args.customers, observation_period=365)
+    models = {
+        'BetaGeometricNBD': BetaGeometricNBD(
+            **dict(
+                zip(
+                    BetaGeometricNBD.__parameters__,
+                    synthetic_draws(
+                        numpy.array([1, 10, 3, 10]),
+                        args.draws
+                    ).T
+                )
+            )
+        ),
+        'ParetoNBD': ParetoNBD(
+            **pareto_nbd_draws(args.draws),
+            prediction_backend='numpy'
+        ),
+    }
+    print(f'{len(data)} customers, {args.draws} draws')
+
+    seconds = {}
+    for name, model in models.items():
+        timings = []
+        for _ in range(args.repeats):
+            start = perf_counter()
+            with ignoring_overflow():
+                model.predict(data, args.periods)
+            timings.append(perf_counter() - start)
+        seconds[name] = min(timings)
+        print(
+            f'{name:>16}: {seconds[name]:.2f}s, '
+            f'{len(data) / seconds[name]:,.0f} customers/s'
+        )
+
+    print(
+        'BetaGeometricNBD is '
+        f'{seconds["ParetoNBD"] / seconds["BetaGeometricNBD"]:.1f} times as '
+        'fast as ParetoNBD'
+    )
@@ -0,0 +1,90 @@
+from argparse import ArgumentParser
+import sys
+from time import perf_counter
+
+import numpy
+import pandas
+
+sys.path.append('/app')
+from synthetic_data import synthetic_rfm  # noqa: E402
+from clv_model.transactions_model import ParetoNBD  # noqa: E402
+
+
+def next_day(data: pandas.DataFrame, seed: int) -> pandas.DataFrame:
+    """
+    The rfm table of the next day, in which customers transact at their
+    historic rate.
+    """
+    random_state = numpy.random.RandomState(seed)
+    transacted = (
+        random_state.uniform(size=len(data)) < data.frequency / data['T']
+    )
+    T = data['T'] + 1
+
+    return data.assign(
+        frequency=data.frequency + transacted,
+        recency=(data.recency + 1).where(~transacted, 0),
+        T=T,
+    )
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(
+        description=(
+            'Time daily refits of the Pareto/NBD model, started cold or '
+            'warm from the previous day.'
+        )
+    )
+    parser.add_argument('--customers', type=int, default=10_000)
+    parser.add_argument('--days', type=int, default=5)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--warm-warmup', type=int, default=150)
+    parser.add_argument('--marginal', action='store_true')
+    args = parser.parse_args()
+
+    data = synthetic_rfm(args.customers, observation_period=365)
+    start = perf_counter()
+    model = ParetoNBD().fit(
+        data,
+        marginal=args.marginal,
+        iter=args.iterations,
+    )
+    print(f'day 0, cold: {perf_counter() - start:.1f}s')
+
+    n_draws = args.iterations - args.iterations // 2
+    for day in range(1, args.days + 1):
+        data = next_day(data, seed=day)
+
+        start = perf_counter()
+        cold = ParetoNBD().fit(
+            data,
+            marginal=args.marginal,
+            iter=args.iterations,
+        )
+        cold_seconds = perf_counter() - start
+
+        # same number of draws as the cold fit, after a shorter warmup
+        start = perf_counter()
+        model = ParetoNBD().fit(
+            data,
+            marginal=args.marginal,
+            warm_start=model,
+            warmup=args.warm_warmup,
+            iter=args.warm_warmup + n_draws,
+        )
+        warm_seconds = perf_counter() - start
+
+        mean_difference = max(
+            abs(
+                getattr(model, parameter).mean()
+                / getattr(cold, parameter).mean()
+                - 1
+            )
+            for parameter in ParetoNBD.__parameters__
+        )
+        print(
+            f'day {day}, cold: {cold_seconds:.1f}s, '
+            f'warm: {warm_seconds:.1f}s, '
+            f'largest relative difference of posterior means: '
+            f'{mean_difference:.4f}'
+        )
@@ -1,43 +1,51 @@
-from importlib import resources
-import os.path
-import pickle
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+import os
 import sys
 
-from pystan import StanModel
-
 sys.path.append('/app')
-STAN_MODELS_PACKAGE = 'clv_model.stan_models'
-
-
-def compile_stan_model(model_filename: str) -> StanModel:
-    model_name = os.path.splitext(model_filename)[0]
-    with resources.open_text(
-        package=STAN_MODELS_PACKAGE,
-        resource=model_filename
-    ) as model_file:
-        return StanModel(model_file, model_name=model_name)
-
+from clv_model.stan_model_cache import (  # noqa: E402
+    cached_model_path,
+    compile_stan_model,
+    is_cached,
+    stan_model_names,
+)
 
-def is_compiled(model_filename: str):
-    with resources.path(STAN_MODELS_PACKAGE, model_filename) as model_path:
-        return model_path.with_suffix('.pkl').is_file()
 
-
-def pickle_model(model_filename: str, stan_model_: StanModel) -> None:
-    with resources.path(STAN_MODELS_PACKAGE, model_filename) as path:
-        pickle_path = path.with_suffix('.pkl')
-    with open(pickle_path, 'wb') as pickle_file:
-        pickle.dump(stan_model_, pickle_file, protocol=pickle.HIGHEST_PROTOCOL)
+def compile_and_cache(model_name: str) -> str:
+    compile_stan_model(model_name)
+    return cached_model_path(model_name)
 
 
 if __name__ == '__main__':
-    for file_ in resources.contents(STAN_MODELS_PACKAGE):
-        extension = os.path.splitext(file_)[1]
-        if extension != '.stan':
-            continue
-
-        if is_compiled(file_):
-            continue
-
-        stan_model = compile_stan_model(file_)
-        pickle_model(file_, stan_model)
+    parser = ArgumentParser(
+        description=(
+            'Compile the Stan models that are missing from the cache, or '
+            'whose cached version is stale.'
+        )
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=os.cpu_count(),
+        help='number of models to compile in parallel',
+    )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='recompile all models, even if they are cached',
+    )
+    args = parser.parse_args()
+
+    model_names = [
+        model_name
+        for model_name in stan_model_names()
+        if args.force or not is_cached(model_name)
+    ]
+    if not model_names:
+        print('All Stan models are up to date.')
+        sys.exit(0)
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        for model_path in pool.map(compile_and_cache, model_names):
+            print(f'Compiled {model_path}')
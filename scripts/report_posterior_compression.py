@@ -0,0 +1,129 @@
+from argparse import ArgumentParser
+from logging import getLogger
+import sys
+from time import perf_counter
+from typing import Callable, Tuple
+
+import numpy
+import pandas
+
+sys.path.append('/app')
+from synthetic_data import (  # noqa: E402
+    ignoring_overflow,
+    pareto_nbd_draws,
+    synthetic_draws,
+    synthetic_rfm,
+)
+from clv_model.posterior_compression import COMPRESSION_METHODS  # noqa: E402
+from clv_model.transactions_model import ParetoNBD  # noqa: E402
+from clv_model.value_model import GammaGamma  # noqa: E402
+
+
+def timed(
+    predict: Callable[[], pandas.Series]
+) -> Tuple[pandas.Series, float]:
+    with ignoring_overflow():
+        start = perf_counter()
+        predictions = predict()
+        return predictions, perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(
+        description=(
+            'Report the error of predictions from compressed posteriors '
+            'against predictions from all draws.'
+        )
+    )
+    parser.add_argument('--transactions-draws', help='ParetoNBD draws')
+    parser.add_argument('--value-draws', help='GammaGamma draws')
+    parser.add_argument('--rfm', help='CSV file with an rfm table')
+    parser.add_argument('--customers', type=int, default=10_000)
+    parser.add_argument('--draws', type=int, default=4000)
+    parser.add_argument('--periods', type=int, default=90)
+    parser.add_argument(
+        '--points',
+        type=int,
+        nargs='*',
+        default=[10, 50, 200]
+    )
+    args = parser.parse_args()
+
+    if args.rfm is not None:
+        data = pandas.read_csv(args.rfm)
+    else:
+        data = synthetic_rfm(args.customers, observation_period=365)
+        data['value'] = numpy.random.RandomState(1).gamma(
+            2, 20, size=len(data)
+        ).round(2)
+
+    if args.transactions_draws is not None:
+        transactions_model = ParetoNBD.from_file(args.transactions_draws)
+    else:
+        transactions_model = ParetoNBD(**pareto_nbd_draws(args.draws))
+    if args.value_draws is not None:
+        value_model = GammaGamma.from_file(
+            args.value_draws,
+            logger=getLogger()
+        )
+    else:
+        value_model = GammaGamma(
+            **dict(
+                zip(
+                    GammaGamma.__parameters__,
+                    synthetic_draws(numpy.array([6, 4, 15]), args.draws).T
+                )
+            ),
+            logger=getLogger()
+        )
+
+    expected_transactions, transactions_seconds = timed(
+        lambda: transactions_model.predict(data, args.periods).transactions
+    )
+    expected_value, value_seconds = timed(
+        lambda: value_model.predict(data).value
+    )
+    print(
+        f'{len(data)} customers, all draws: transactions '
+        f'{transactions_seconds:.2f}s, value {value_seconds:.2f}s'
+    )
+    print(
+        f'{(~numpy.isfinite(expected_transactions)).sum()} customers '
+        f'without finite expected transactions'
+    )
+
+    print(
+        f'{"method":>8} {"points":>6} '
+        f'{"transactions error":>28} {"value error":>28}'
+    )
+    print(
+        f'{"":>8} {"":>6} '
+        f'{"median":>9} {"max":>9} {"time":>8} '
+        f'{"median":>9} {"max":>9} {"time":>8}'
+    )
+    for method in COMPRESSION_METHODS:
+        for n_points in args.points:
+            compressed_transactions, transactions_seconds = timed(
+                lambda: transactions_model.compress(n_points, method, seed=0)
+                .predict(data, args.periods).transactions
+            )
+            compressed_value, value_seconds = timed(
+                lambda: value_model.compress(n_points, method, seed=0)
+                .predict(data).value
+            )
+            transactions_error = (
+                (compressed_transactions - expected_transactions).abs()
+                / expected_transactions
+            )
+            value_error = (
+                (compressed_value - expected_value).abs() / expected_value
+            )
+            print(
+                f'{method:>8} {n_points:>6} '
+                f'{transactions_error.median():>9.2e} '
+                f'{transactions_error.max():>9.2e} '
+                f'{transactions_seconds:>7.2f}s '
+                f'{value_error.median():>9.2e} '
+                f'{value_error.max():>9.2e} '
+                f'{value_seconds:>7.2f}s'
+            )
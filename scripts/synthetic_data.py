@@ -0,0 +1,98 @@
+"""
+Synthetic customers and posterior draws shared by the benchmark and
+report scripts, for runs without real data or fitted models.
+"""
+import sys
+from typing import Dict
+
+import numpy
+import pandas
+
+sys.path.append('/app')
+from clv_model.transactions_model import ParetoNBD  # noqa: E402
+
+# r, alpha, s and beta of the Pareto/NBD model synthetic customers are
+# drawn from
+PARETO_NBD_PARAMETERS = numpy.array([1, 10, 1, 50])
+
+
+def synthetic_rfm(
+    n_customers: int,
+    observation_period: int,
+    seed: int = 0
+) -> pandas.DataFrame:
+    """
+    Draw customers from a Pareto/NBD model, keeping those with at least
+    one repeat transaction.
+    """
+    r, alpha, s, beta = PARETO_NBD_PARAMETERS
+    random_state = numpy.random.RandomState(seed)
+    transaction_rate = random_state.gamma(r, 1 / alpha, size=n_customers)
+    lifetime = random_state.exponential(
+        1 / random_state.gamma(s, 1 / beta, size=n_customers)
+    )
+    T = random_state.randint(1, observation_period + 1, size=n_customers)
+    active = numpy.minimum(lifetime, T)
+
+    frequency = random_state.poisson(transaction_rate * active)
+    # given their number, transaction times are uniform over the active
+    # period, so the last one is the maximum of frequency uniforms
+    last_transaction = numpy.floor(
+        active * random_state.uniform(size=n_customers)
+        ** (1 / numpy.maximum(frequency, 1))
+    )
+    # as in rfm, recency is the time from the last transaction to the
+    # end of the observation period
+    recency = T - last_transaction
+
+    return pandas.DataFrame(
+        data={
+            'id': numpy.arange(n_customers),
+            'frequency': frequency,
+            'recency': recency,
+            'T': T,
+        }
+    )[lambda df: df.frequency > 0].reset_index(drop=True)
+
+
+def synthetic_draws(
+    means: numpy.ndarray,
+    n_draws: int,
+    seed: int = 0
+) -> numpy.ndarray:
+    """
+    Correlated log-normal draws standing in for a posterior, when no
+    fitted draws are given.
+    """
+    random_state = numpy.random.RandomState(seed)
+    correlation = 0.5 + 0.5 * numpy.eye(len(means))
+
+    return means * numpy.exp(
+        random_state.multivariate_normal(
+            mean=numpy.zeros(len(means)),
+            cov=0.05 * correlation,
+            size=n_draws
+        )
+    )
+
+
+def pareto_nbd_draws(n_draws: int) -> Dict[str, numpy.ndarray]:
+    """
+    ParetoNBD parameter draws around the parameters synthetic customers
+    are drawn from.
+    """
+    return dict(
+        zip(
+            ParetoNBD.__parameters__,
+            synthetic_draws(PARETO_NBD_PARAMETERS, n_draws).T
+        )
+    )
+
+
+def ignoring_overflow() -> numpy.errstate:
+    """
+    Silence floating point warnings of predictions on synthetic
+    customers. ParetoNBD overflows for customers with many transactions,
+    whose predictions come out as nan or inf rather than failing.
+    """
+    return numpy.errstate(all='ignore')
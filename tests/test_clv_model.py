@@ -52,6 +52,27 @@ class TestCLVModel(unittest.TestCase):
         ).assign(clv=lambda df: df.clv.round(2))
         assert_frame_equal(actual, expected)
 
+    def test_predict_compact(self) -> None:
+        data = self._get_df()
+        compact_data = data.assign(
+            id=pandas.Categorical(['a', 'b', 'c']),
+            recency=data.recency.astype('int8'),
+            frequency=data.frequency.astype('int8'),
+            T=data['T'].astype('int16'),
+            value=data.value.astype('float32'),
+        )
+        model = self._get_model()
+        actual = model.predict(
+            data=compact_data,
+            periods=1,
+            discount_rate=0.15
+        )
+        expected = (
+            model.predict(data=data, periods=1, discount_rate=0.15)
+            .assign(id=pandas.Categorical(['a', 'b', 'c']))
+        )
+        assert_frame_equal(actual, expected)
+
     def test_predict_no_discount(self) -> None:
         data = self._get_df()
         model = self._get_model()
@@ -117,6 +138,18 @@ class TestCLVModel(unittest.TestCase):
         )
         self.assertTrue(actual.empty)
 
+    def test_predict_reordered(self) -> None:
+        model = self._get_model()
+        predict = model.value_model.predict
+        model.value_model.predict = lambda data: predict(data).iloc[::-1]
+        with self.assertRaises(ValueError) as error:
+            model.predict(data=self._get_df(), periods=1, discount_rate=0.15)
+        self.assertEqual(
+            str(error.exception),
+            'Predictions of the value model are not in the order of the '
+            'rows of data.'
+        )
+
     def test_predict_unfit(self) -> None:
         model = self._get_model(global_mean=None)
         data = self._get_df()
@@ -1,10 +1,19 @@
 from datetime import date
+import io
 import unittest
+import warnings
 
+import numpy
 import pandas
 from pandas.testing import assert_frame_equal
 
-from clv_model.data_wrangling.rfm import rfm
+from clv_model.data_wrangling.rfm import (
+    compact_rfm,
+    rfm,
+    rfm_calibration_holdout,
+    rfm_from_chunks,
+    rfm_rollup,
+)
 
 
 class TestDataWrangling(unittest.TestCase):
@@ -87,3 +96,376 @@ class TestDataWrangling(unittest.TestCase):
         )
 
         assert_frame_equal(actual, expected)
+
+    def _get_random_transactions(self) -> pandas.DataFrame:
+        random_state = numpy.random.RandomState(1729)
+        size = 2000
+        transactions = pandas.DataFrame(
+            data={
+                'customer_id': random_state.choice(
+                    ['a', 'b', 'c', 'd', 'e', 'f', 'g'],
+                    size=size
+                ),
+                'order_date': (
+                    pandas.Timestamp('2020-01-01')
+                    + pandas.to_timedelta(
+                        random_state.randint(24 * 200, size=size),
+                        unit='H'
+                    )
+                ),
+                'invoice': random_state.gamma(2, 10, size=size).round(2)
+            }
+        )
+        transactions.loc[random_state.rand(size) < 0.1, 'invoice'] = None
+        return transactions
+
+    def test_rfm_engines_agree(self) -> None:
+        # with a customer whose values are all missing, which neither
+        # engine warns about
+        transactions = pandas.concat(
+            [
+                self._get_random_transactions(),
+                pandas.DataFrame(
+                    data={
+                        'customer_id': ['z', 'z'],
+                        'order_date': pandas.to_datetime(
+                            ['2020-01-03', '2020-02-10']
+                        ),
+                        'invoice': [None, None],
+                    }
+                ),
+            ],
+            ignore_index=True
+        )
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', RuntimeWarning)
+            for period in ['D', 'W', 'M', '2D']:
+                for observation_period_end in [
+                    None,
+                    pandas.Timestamp('2020-04-01')
+                ]:
+                    kwargs = {
+                        'transactions': transactions,
+                        'customer_id_col': 'customer_id',
+                        'date_col': 'order_date',
+                        'value_col': 'invoice',
+                        'period': period,
+                        'observation_period_end': observation_period_end,
+                    }
+                    assert_frame_equal(
+                        rfm(**kwargs, engine='numpy'),
+                        rfm(**kwargs, engine='pandas')
+                    )
+
+    def test_rfm_sharded(self) -> None:
+        transactions = self._get_random_transactions()
+        for engine in ['numpy', 'pandas']:
+            kwargs = {
+                'transactions': transactions,
+                'customer_id_col': 'customer_id',
+                'date_col': 'order_date',
+                'value_col': 'invoice',
+                'period': 'W',
+                'engine': engine,
+            }
+            assert_frame_equal(
+                rfm(**kwargs, n_jobs=3),
+                rfm(**kwargs)
+            )
+
+    def test_rfm_sharded_observation_period_end(self) -> None:
+        # the first transaction of a comes after the end, so b is the
+        # first customer observed
+        transactions = pandas.DataFrame(
+            data={
+                'customer_id': ['a', 'b', 'a', 'c'],
+                'order_date': pandas.to_datetime(
+                    ['2020-02-01', '2020-01-01', '2020-01-05', '2020-01-03']
+                ),
+            }
+        )
+        for engine in ['numpy', 'pandas']:
+            kwargs = {
+                'transactions': transactions,
+                'customer_id_col': 'customer_id',
+                'date_col': 'order_date',
+                'observation_period_end': pandas.Timestamp('2020-01-10'),
+                'engine': engine,
+            }
+            expected = rfm(**kwargs)
+            self.assertEqual(list(expected.id), ['b', 'a', 'c'])
+            assert_frame_equal(rfm(**kwargs, n_jobs=2), expected)
+
+    def test_rfm_unknown_engine(self) -> None:
+        with self.assertRaises(ValueError) as error:
+            rfm(
+                transactions=self._get_random_transactions(),
+                customer_id_col='customer_id',
+                date_col='order_date',
+                engine='polars'
+            )
+        self.assertEqual(str(error.exception), 'Unknown engine "polars".')
+
+    def test_rfm_from_chunks(self) -> None:
+        transactions = (
+            self._get_random_transactions()
+            .assign(invoice=lambda df: df.invoice.round())
+        )
+        for period in ['D', 'W', 'M']:
+            for value_col in ['invoice', None]:
+                kwargs = {
+                    'customer_id_col': 'customer_id',
+                    'date_col': 'order_date',
+                    'value_col': value_col,
+                    'period': period,
+                    'observation_period_end': pandas.Timestamp('2020-06-01'),
+                }
+                chunks = (
+                    transactions.iloc[start:start + 97]
+                    for start in range(0, len(transactions), 97)
+                )
+                assert_frame_equal(
+                    rfm_from_chunks(chunks=chunks, **kwargs),
+                    rfm(transactions=transactions, **kwargs)
+                )
+
+    def test_rfm_from_chunks_csv(self) -> None:
+        transactions = (
+            self._get_random_transactions()
+            .assign(invoice=lambda df: df.invoice.round())
+        )
+        csv = io.StringIO()
+        transactions.to_csv(csv, index=False)
+        csv.seek(0)
+
+        actual = rfm_from_chunks(
+            chunks=pandas.read_csv(csv, chunksize=250),
+            customer_id_col='customer_id',
+            date_col='order_date',
+            value_col='invoice',
+            period='W',
+        )
+        expected = rfm(
+            transactions=transactions,
+            customer_id_col='customer_id',
+            date_col='order_date',
+            value_col='invoice',
+            period='W',
+        )
+        assert_frame_equal(actual, expected)
+
+    def test_rfm_from_chunks_same_period_split(self) -> None:
+        chunks = [
+            pandas.DataFrame(
+                data={
+                    'customer_id': [0, 1],
+                    'order_date': [date(2020, 1, 1), date(2020, 1, 2)],
+                    'invoice': [10, 4],
+                }
+            ),
+            pandas.DataFrame(
+                data={
+                    'customer_id': [0, 0],
+                    'order_date': [date(2020, 1, 1), date(2020, 1, 3)],
+                    'invoice': [20, 30],
+                }
+            ),
+        ]
+        actual = rfm_from_chunks(
+            chunks=chunks,
+            customer_id_col='customer_id',
+            date_col='order_date',
+            value_col='invoice',
+        )
+        expected = pandas.DataFrame(
+            data={
+                'id': [0, 1],
+                'recency': [0, 1],
+                'frequency': [2, 1],
+                'T': [2, 1],
+                'value': [22.5, 4]
+            }
+        )
+        assert_frame_equal(actual, expected)
+
+    def test_rfm_calibration_holdout(self) -> None:
+        transactions = pandas.DataFrame(
+            data={
+                'customer_id': [0, 0, 0, 1, 1, 2, 3, 0],
+                'order_date': [
+                    date(2020, 1, 1),
+                    date(2020, 1, 4),
+                    date(2020, 1, 6),
+                    date(2020, 1, 2),
+                    date(2020, 1, 3),
+                    date(2020, 1, 7),
+                    date(2020, 1, 8),
+                    date(2020, 1, 6),
+                ],
+                'invoice': [10, 10, 20, 0, 5, 100, 1, 40]
+            }
+        )
+
+        actual = rfm_calibration_holdout(
+            transactions=transactions,
+            customer_id_col='customer_id',
+            date_col='order_date',
+            calibration_period_end=date(2020, 1, 4),
+            value_col='invoice',
+        )
+        expected = pandas.DataFrame(
+            data={
+                'id': [0, 1],
+                'recency': [0, 1],
+                'frequency': [2, 2],
+                'T': [3, 2],
+                'value': [10, 2.5],
+                'frequency_holdout': [1, 0],
+                'value_holdout': [30, 0],
+                'duration_holdout': [4, 4],
+            }
+        )
+        assert_frame_equal(actual, expected, check_dtype=False)
+
+        calibration = rfm(
+            transactions=transactions,
+            customer_id_col='customer_id',
+            date_col='order_date',
+            observation_period_end=pandas.Timestamp(2020, 1, 4),
+        )
+        actual = rfm_calibration_holdout(
+            transactions=transactions,
+            customer_id_col='customer_id',
+            date_col='order_date',
+            calibration_period_end=date(2020, 1, 4),
+        )
+        assert_frame_equal(actual[calibration.columns], calibration)
+        self.assertNotIn('value_holdout', actual.columns)
+
+    def test_rfm_calibration_holdout_empty_holdout(self) -> None:
+        transactions = self._get_random_transactions()
+        calibration = rfm(
+            transactions=transactions,
+            customer_id_col='customer_id',
+            date_col='order_date',
+            value_col='invoice',
+            observation_period_end=pandas.Timestamp('2021-03-01'),
+        )
+        actual = rfm_calibration_holdout(
+            transactions=transactions,
+            customer_id_col='customer_id',
+            date_col='order_date',
+            calibration_period_end='2021-03-01',
+            value_col='invoice',
+            observation_period_end='2021-06-01',
+        )
+        expected = calibration.assign(
+            frequency_holdout=0,
+            value_holdout=0.,
+            duration_holdout=92,
+        )
+        assert_frame_equal(actual, expected)
+
+    def test_rfm_calibration_holdout_string_end(self) -> None:
+        transactions = self._get_random_transactions()
+        kwargs = {
+            'transactions': transactions,
+            'customer_id_col': 'customer_id',
+            'date_col': 'order_date',
+            'calibration_period_end': '2020-04-01',
+            'value_col': 'invoice',
+        }
+        assert_frame_equal(
+            rfm_calibration_holdout(
+                **kwargs,
+                observation_period_end='2020-06-01'
+            ),
+            rfm_calibration_holdout(
+                **kwargs,
+                observation_period_end=pandas.Timestamp('2020-06-01')
+            )
+        )
+
+    def test_rfm_calibration_holdout_bad_end(self) -> None:
+        with self.assertRaises(ValueError) as error:
+            rfm_calibration_holdout(
+                transactions=self._get_random_transactions(),
+                customer_id_col='customer_id',
+                date_col='order_date',
+                calibration_period_end='2021-01-01',
+            )
+        self.assertEqual(
+            str(error.exception),
+            'Calibration period must end before the observation period.'
+        )
+
+    def test_compact_rfm(self) -> None:
+        transactions = self._get_random_transactions()
+        expected = rfm(
+            transactions=transactions,
+            customer_id_col='customer_id',
+            date_col='order_date',
+            value_col='invoice',
+        )
+        actual = rfm(
+            transactions=transactions,
+            customer_id_col='customer_id',
+            date_col='order_date',
+            value_col='invoice',
+            compact=True,
+        )
+
+        self.assertIsInstance(actual.id.dtype, pandas.CategoricalDtype)
+        self.assertEqual(list(actual.id.cat.categories), list(expected.id))
+        for column in ['recency', 'frequency', 'T']:
+            self.assertLessEqual(actual[column].dtype.itemsize, 4)
+        assert_frame_equal(
+            actual.astype({'id': object}),
+            expected,
+            check_dtype=False
+        )
+
+        actual = compact_rfm(expected, value_dtype=numpy.float32)
+        self.assertEqual(actual.value.dtype, numpy.float32)
+        numpy.testing.assert_allclose(actual.value, expected.value, atol=1e-4)
+
+        actual = compact_rfm(expected.assign(id=range(len(expected))))
+        self.assertLessEqual(actual.id.dtype.itemsize, 4)
+
+    def test_rfm_rollup(self) -> None:
+        transactions = self._get_random_transactions()
+        for value_col in ['invoice', None]:
+            actual = rfm_rollup(
+                transactions=transactions,
+                customer_id_col='customer_id',
+                date_col='order_date',
+                value_col=value_col,
+                periods=['D', 'W', 'M'],
+                observation_period_end=pandas.Timestamp('2020-06-10 12:00'),
+            )
+            self.assertEqual(list(actual), ['D', 'W', 'M'])
+            for period, rfm_df in actual.items():
+                expected = rfm(
+                    transactions=transactions,
+                    customer_id_col='customer_id',
+                    date_col='order_date',
+                    value_col=value_col,
+                    period=period,
+                    observation_period_end=pandas.Timestamp(
+                        '2020-06-10 12:00'
+                    ),
+                )
+                assert_frame_equal(rfm_df, expected)
+
+    def test_rfm_rollup_not_nested(self) -> None:
+        with self.assertRaises(ValueError) as error:
+            rfm_rollup(
+                transactions=self._get_random_transactions(),
+                customer_id_col='customer_id',
+                date_col='order_date',
+                periods=['W', 'M'],
+            )
+        self.assertEqual(
+            str(error.exception),
+            'Period "W" is not contained in period "M".'
+        )
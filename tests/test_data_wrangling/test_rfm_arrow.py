@@ -0,0 +1,110 @@
+from datetime import date
+import importlib.util
+import os
+import tempfile
+import unittest
+
+import pandas
+from pandas.testing import assert_frame_equal
+
+from clv_model.data_wrangling.rfm import rfm
+from clv_model.data_wrangling.rfm_arrow import rfm_from_arrow
+
+
+@unittest.skipIf(
+    importlib.util.find_spec('pyarrow') is None,
+    'pyarrow is not installed'
+)
+class TestRFMFromArrow(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.transactions = pandas.DataFrame(
+            data={
+                'customer_id': ['a', 'a', 'a', 'b', 'b', 'c', None],
+                'order_date': pandas.to_datetime(
+                    [
+                        date(2020, 1, 1),
+                        date(2020, 1, 4),
+                        date(2020, 1, 4),
+                        date(2020, 1, 2),
+                        date(2020, 1, 6),
+                        date(2020, 1, 3),
+                        date(2020, 1, 3),
+                    ]
+                ),
+                'invoice': [10, 10, 20, 0, 5, 100, 7],
+                'store': [1, 2, 3, 4, 5, 6, 7],
+            }
+        )
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def _expected(self, **kwargs) -> pandas.DataFrame:
+        return rfm(
+            transactions=self.transactions,
+            customer_id_col='customer_id',
+            date_col='order_date',
+            value_col='invoice',
+            **kwargs
+        )
+
+    def test_parquet(self) -> None:
+        import pyarrow.parquet
+
+        path = os.path.join(self.directory.name, 'transactions.parquet')
+        pyarrow.parquet.write_table(
+            pyarrow.Table.from_pandas(self.transactions),
+            path,
+            row_group_size=3
+        )
+
+        for period in ['D', 'W']:
+            actual = rfm_from_arrow(
+                path=path,
+                customer_id_col='customer_id',
+                date_col='order_date',
+                value_col='invoice',
+                period=period,
+            )
+            assert_frame_equal(actual, self._expected(period=period))
+
+    def test_ipc(self) -> None:
+        import pyarrow.feather
+
+        path = os.path.join(self.directory.name, 'transactions.arrow')
+        pyarrow.feather.write_feather(self.transactions, path, chunksize=3)
+
+        actual = rfm_from_arrow(
+            path=path,
+            customer_id_col='customer_id',
+            date_col='order_date',
+            value_col='invoice',
+            observation_period_end=date(2020, 1, 4),
+            file_format='ipc',
+        )
+        expected = self._expected(
+            observation_period_end=pandas.Timestamp(2020, 1, 4)
+        )
+        assert_frame_equal(actual, expected)
+
+    def test_missing_column(self) -> None:
+        import pyarrow.parquet
+
+        path = os.path.join(self.directory.name, 'transactions.parquet')
+        pyarrow.parquet.write_table(
+            pyarrow.Table.from_pandas(self.transactions),
+            path
+        )
+
+        with self.assertRaises(ValueError) as error:
+            rfm_from_arrow(
+                path=path,
+                customer_id_col='customer_id',
+                date_col='order_date',
+                value_col='revenue',
+            )
+        self.assertEqual(
+            str(error.exception),
+            'Column "revenue" not found in dataset.'
+        )
@@ -0,0 +1,119 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+
+import numpy
+import pandas
+from pandas.testing import assert_frame_equal
+
+from clv_model.data_wrangling.rfm import rfm
+from clv_model.data_wrangling.rfm_out_of_core import (
+    rfm_out_of_core,
+    rfm_out_of_core_to_parquet,
+)
+
+
+class TestRFMOutOfCore(unittest.TestCase):
+    def setUp(self) -> None:
+        random_state = numpy.random.RandomState(1729)
+        size = 3000
+        self.transactions = pandas.DataFrame(
+            data={
+                'customer_id': random_state.randint(500, size=size),
+                'order_date': (
+                    pandas.Timestamp('2020-01-01')
+                    + pandas.to_timedelta(
+                        random_state.randint(24 * 100, size=size),
+                        unit='H'
+                    )
+                ),
+                'invoice': random_state.randint(100, size=size),
+            }
+        )
+        self.expected = (
+            rfm(
+                transactions=self.transactions,
+                customer_id_col='customer_id',
+                date_col='order_date',
+                value_col='invoice',
+                period='W',
+            )
+            .sort_values('id')
+            .reset_index(drop=True)
+        )
+
+    def _chunks(self):
+        for start in range(0, len(self.transactions), 400):
+            yield self.transactions.iloc[start:start + 400]
+
+    def test_rfm_out_of_core(self) -> None:
+        # with the lowest limit, partitions are split into more tables
+        # than there are partitions to begin with
+        for memory_limit, minimum_tables in [(2**10, 400), (2**30, 1)]:
+            rfm_dfs = list(
+                rfm_out_of_core(
+                    chunks=self._chunks(),
+                    customer_id_col='customer_id',
+                    date_col='order_date',
+                    value_col='invoice',
+                    period='W',
+                    memory_limit=memory_limit,
+                )
+            )
+            self.assertGreaterEqual(len(rfm_dfs), minimum_tables)
+
+            actual = (
+                pandas.concat(rfm_dfs)
+                .sort_values('id')
+                .reset_index(drop=True)
+            )
+            assert_frame_equal(actual, self.expected)
+
+    def test_rfm_out_of_core_mixed_id_dtypes(self) -> None:
+        def chunks():
+            for number, chunk in enumerate(self._chunks()):
+                if number % 2:
+                    chunk = chunk.astype({'customer_id': numpy.float64})
+                yield chunk
+
+        actual = (
+            pandas.concat(
+                rfm_out_of_core(
+                    chunks=chunks(),
+                    customer_id_col='customer_id',
+                    date_col='order_date',
+                    value_col='invoice',
+                    period='W',
+                    memory_limit=2**14,
+                )
+            )
+            .sort_values('id')
+            .reset_index(drop=True)
+        )
+        assert_frame_equal(actual, self.expected, check_dtype=False)
+
+    @unittest.skipIf(
+        importlib.util.find_spec('pyarrow') is None,
+        'pyarrow is not installed'
+    )
+    def test_rfm_out_of_core_to_parquet(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'rfm')
+            file_paths = rfm_out_of_core_to_parquet(
+                path=path,
+                chunks=self._chunks(),
+                customer_id_col='customer_id',
+                date_col='order_date',
+                value_col='invoice',
+                period='W',
+                memory_limit=2**14,
+            )
+            self.assertGreater(len(file_paths), 1)
+
+            actual = (
+                pandas.read_parquet(path)
+                .sort_values('id')
+                .reset_index(drop=True)
+            )
+        assert_frame_equal(actual, self.expected)
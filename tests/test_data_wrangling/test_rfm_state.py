@@ -0,0 +1,135 @@
+from datetime import date
+import os
+import tempfile
+import unittest
+
+import pandas
+from pandas.testing import assert_frame_equal
+
+from clv_model.data_wrangling.rfm import rfm
+from clv_model.data_wrangling.rfm_state import RFMState
+
+
+class TestRFMState(unittest.TestCase):
+    def _get_transactions(self) -> pandas.DataFrame:
+        return pandas.DataFrame(
+            data={
+                'customer_id': [0, 1, 0, 2, 0, 1, 3, 0],
+                'order_date': pandas.to_datetime(
+                    [
+                        date(2020, 1, 1),
+                        date(2020, 1, 2),
+                        date(2020, 1, 4),
+                        date(2020, 1, 5),
+                        date(2020, 1, 8),
+                        date(2020, 1, 8),
+                        date(2020, 1, 9),
+                        date(2020, 1, 15),
+                    ]
+                ),
+                'invoice': [10, 4, 20, 5, 30, None, 7, 1]
+            }
+        )
+
+    def test_update(self) -> None:
+        transactions = self._get_transactions()
+        for period in ['D', 'W']:
+            state = RFMState(
+                customer_id_col='customer_id',
+                date_col='order_date',
+                value_col='invoice',
+                period=period,
+            )
+            previous_end = pandas.Timestamp('2019-12-31')
+            for end in pandas.to_datetime(
+                ['2020-01-04', '2020-01-07', '2020-01-12', '2020-01-20']
+            ):
+                batch = transactions[
+                    (transactions.order_date > previous_end)
+                    & (transactions.order_date <= end)
+                ]
+                state.update(batch, observation_period_end=end)
+                previous_end = end
+
+                expected = rfm(
+                    transactions=transactions,
+                    customer_id_col='customer_id',
+                    date_col='order_date',
+                    value_col='invoice',
+                    period=period,
+                    observation_period_end=end,
+                )
+                assert_frame_equal(state.to_rfm(), expected)
+
+    def test_update_same_period(self) -> None:
+        state = RFMState(
+            customer_id_col='customer_id',
+            date_col='order_date',
+            value_col='invoice',
+        )
+        state.update(
+            pandas.DataFrame(
+                data={
+                    'customer_id': [0],
+                    'order_date': [pandas.Timestamp('2020-01-01 09:00')],
+                    'invoice': [10],
+                }
+            )
+        )
+        state.update(
+            pandas.DataFrame(
+                data={
+                    'customer_id': [0],
+                    'order_date': [pandas.Timestamp('2020-01-01 17:00')],
+                    'invoice': [20],
+                }
+            )
+        )
+        expected = pandas.DataFrame(
+            data={
+                'id': [0],
+                'recency': [0],
+                'frequency': [1],
+                'T': [0],
+                'value': [15.0],
+            }
+        )
+        assert_frame_equal(state.to_rfm(), expected)
+
+    def test_update_late_transactions(self) -> None:
+        transactions = self._get_transactions()
+        state = RFMState(customer_id_col='customer_id', date_col='order_date')
+        state.update(transactions)
+        with self.assertRaises(ValueError) as error:
+            state.update(transactions.tail(1))
+        self.assertEqual(
+            str(error.exception),
+            'Transactions must be later than the current observation '
+            'period end.'
+        )
+
+    def test_update_transactions_after_end(self) -> None:
+        state = RFMState(customer_id_col='customer_id', date_col='order_date')
+        with self.assertRaises(ValueError) as error:
+            state.update(
+                self._get_transactions(),
+                observation_period_end='2020-01-12'
+            )
+        self.assertEqual(
+            str(error.exception),
+            'Transactions must not be later than the observation period end.'
+        )
+
+    def test_to_file(self) -> None:
+        state = RFMState(
+            customer_id_col='customer_id',
+            date_col='order_date',
+            value_col='invoice',
+        )
+        state.update(self._get_transactions())
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'rfm_state.pkl')
+            state.to_file(file_path)
+            loaded = RFMState.from_file(file_path)
+
+        assert_frame_equal(loaded.to_rfm(), state.to_rfm())
@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+import unittest
+
+import numpy
+
+from clv_model.fit_diagnostics import FitDiagnostics
+
+
+class TestFitDiagnostics(unittest.TestCase):
+    def _get_fit(self) -> SimpleNamespace:
+        def get_sampler_params(inc_warmup: bool):
+            iterations = 200 if inc_warmup else 100
+            # warmup draws take three leapfrog steps, and sampling draws
+            # one, so that three quarters of the time is warmup
+            return [
+                {
+                    'n_leapfrog__': numpy.array(
+                        [3.0] * (iterations - 100) + [1.0] * 100
+                    ),
+                    'divergent__': numpy.array(
+                        [0.0] * (iterations - chain) + [1.0] * chain
+                    ),
+                    'treedepth__': numpy.array(
+                        [10.0] * chain + [3.0] * (iterations - chain)
+                    ),
+                }
+                for chain in range(2)
+            ]
+
+        return SimpleNamespace(
+            get_sampler_params=get_sampler_params,
+            get_stepsize=lambda: [0.2, 0.4],
+            summary=lambda pars: {
+                'summary': numpy.array([[1.0, 150.0, 1.01], [2.0, 50.0, 1.1]]),
+                'summary_colnames': ('mean', 'n_eff', 'Rhat'),
+                'summary_rownames': numpy.array(pars),
+            },
+        )
+
+    def test_add_sampler_diagnostics(self) -> None:
+        diagnostics = FitDiagnostics(
+            model_name='pareto_nbd_marginal',
+            method='sampling',
+            rows=10,
+            customers=20.0,
+            seconds={'prepare': 1.0},
+        )
+        diagnostics.add_sampler_diagnostics(
+            fit=self._get_fit(),
+            parameters=['r', 'alpha'],
+            stan_seconds=8.0,
+        )
+        diagnostics.seconds['extract'] = 1.0
+        diagnostics.finish()
+
+        self.assertEqual(
+            diagnostics.seconds,
+            {'prepare': 1.0, 'warmup': 6.0, 'sampling': 2.0, 'extract': 1.0}
+        )
+        self.assertEqual(diagnostics.chains, 2)
+        self.assertEqual(diagnostics.draws, 200)
+        self.assertAlmostEqual(diagnostics.stepsize, 0.3)
+        self.assertEqual(diagnostics.divergences, 1)
+        self.assertEqual(diagnostics.max_treedepth_hits, 1)
+        self.assertEqual(
+            diagnostics.effective_sample_size,
+            {'r': 150.0, 'alpha': 50.0}
+        )
+        self.assertEqual(diagnostics.ess_per_second, {'r': 15.0, 'alpha': 5.0})
+        self.assertEqual(diagnostics.r_hat, {'r': 1.01, 'alpha': 1.1})
+
+        self.assertEqual(
+            FitDiagnostics.from_json(diagnostics.to_json()),
+            diagnostics
+        )
@@ -0,0 +1,25 @@
+import subprocess
+import sys
+import unittest
+
+HEAVY_MODULES = ('numba', 'pystan', 'scipy')
+
+
+class TestImports(unittest.TestCase):
+    def test_heavy_modules_not_imported(self) -> None:
+        # run in a fresh interpreter, as other tests import these modules
+        code = (
+            'import sys\n'
+            'import clv_model.clv_model\n'
+            'import clv_model.data_wrangling.rfm\n'
+            'import clv_model.transactions_model\n'
+            'import clv_model.value_model\n'
+            f'print(*sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules))'
+        )
+        imported = subprocess.run(
+            [sys.executable, '-c', code],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.split()
+        self.assertEqual(imported, [])
@@ -0,0 +1,52 @@
+import unittest
+
+import numpy
+
+from clv_model.posterior_compression import (
+    COMPRESSION_METHODS,
+    compress_draws,
+)
+
+
+class TestCompressDraws(unittest.TestCase):
+    def setUp(self) -> None:
+        random_state = numpy.random.RandomState(1729)
+        self.draws = numpy.exp(
+            random_state.multivariate_normal(
+                mean=[0, 1, -1],
+                cov=[[0.2, 0.1, 0], [0.1, 0.2, 0], [0, 0, 0.1]],
+                size=2000
+            )
+        )
+
+    def test_compress_draws(self) -> None:
+        expected = self.draws.mean(axis=0)
+        tolerances = {'thin': 0.1, 'quantile': 0.1, 'herding': 0.02}
+        for method in COMPRESSION_METHODS:
+            indices, weights = compress_draws(
+                self.draws,
+                n_points=50,
+                method=method,
+                seed=0
+            )
+            self.assertLessEqual(len(indices), 50)
+            self.assertEqual(len(indices), len(weights))
+            self.assertAlmostEqual(weights.sum(), 1)
+            numpy.testing.assert_allclose(
+                weights @ self.draws[indices],
+                expected,
+                rtol=tolerances[method]
+            )
+
+    def test_compress_draws_too_many_points(self) -> None:
+        indices, weights = compress_draws(self.draws, n_points=5000)
+        numpy.testing.assert_array_equal(indices, numpy.arange(2000))
+        numpy.testing.assert_allclose(weights, 1 / 2000)
+
+    def test_compress_draws_unknown_method(self) -> None:
+        with self.assertRaises(ValueError) as error:
+            compress_draws(self.draws, n_points=10, method='random')
+        self.assertEqual(
+            str(error.exception),
+            'Unknown compression method "random".'
+        )
@@ -0,0 +1,440 @@
+from dataclasses import replace
+from logging import getLogger
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy
+from numpy.testing import assert_array_equal
+import pandas
+from pandas.testing import assert_frame_equal
+
+from clv_model.fit_diagnostics import FitDiagnostics
+from clv_model.stan_model_base import (
+    collapse_rows,
+    stratified_sample,
+    unique_rows,
+)
+from clv_model.transactions_model import ParetoNBD
+from clv_model.value_model import GammaGamma
+
+
+class TestStanModelBase(unittest.TestCase):
+    def _get_model(self) -> GammaGamma:
+        random_state = numpy.random.RandomState(1729)
+        return GammaGamma(
+            p=random_state.gamma(2, size=100),
+            q=random_state.gamma(2, size=100),
+            mu=random_state.gamma(2, size=100),
+            logger=getLogger()
+        )
+
+    def _assert_same_draws(
+        self,
+        actual: GammaGamma,
+        expected: GammaGamma
+    ) -> None:
+        for parameter in ['p', 'q', 'mu']:
+            assert_array_equal(
+                getattr(actual, parameter),
+                getattr(expected, parameter)
+            )
+
+    def test_to_file_csv(self) -> None:
+        model = self._get_model()
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'draws.csv')
+            model.to_file(file_path)
+            loaded = GammaGamma.from_file(file_path, logger=getLogger())
+
+        numpy.testing.assert_allclose(loaded.p, model.p)
+        numpy.testing.assert_allclose(loaded.q, model.q)
+        numpy.testing.assert_allclose(loaded.mu, model.mu)
+
+    def test_to_file_npy(self) -> None:
+        model = self._get_model()
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'draws')
+            model.to_file(file_path, file_format='npy')
+
+            loaded = GammaGamma.from_file(file_path, logger=getLogger())
+            self.assertIsInstance(loaded.p, numpy.memmap)
+            self._assert_same_draws(loaded, model)
+            del loaded
+
+            loaded = GammaGamma.from_file(
+                file_path,
+                memory_map=False,
+                logger=getLogger()
+            )
+            self.assertNotIsInstance(loaded.p, numpy.memmap)
+            self._assert_same_draws(loaded, model)
+
+    def test_to_file_fit_diagnostics(self) -> None:
+        model = self._get_model()
+        model.fit_diagnostics = FitDiagnostics(
+            model_name='gamma_gamma',
+            method='sampling',
+            rows=100,
+            customers=100.0,
+            seconds={'warmup': 2.0, 'sampling': 2.0},
+            chains=4,
+            draws=4000,
+            stepsize=0.4,
+            divergences=1,
+            max_treedepth_hits=0,
+            effective_sample_size={'p': 1000.0, 'q': 800.0, 'mu': 1200.0},
+            ess_per_second={'p': 250.0, 'q': 200.0, 'mu': 300.0},
+            r_hat={'p': 1.0, 'q': 1.01, 'mu': 1.0},
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for file_format, file_name in [
+                ('csv', 'draws.csv'),
+                ('npy', 'draws'),
+            ]:
+                file_path = os.path.join(directory, file_name)
+                model.to_file(file_path, file_format=file_format)
+                loaded = GammaGamma.from_file(file_path, logger=getLogger())
+                self.assertEqual(loaded.fit_diagnostics, model.fit_diagnostics)
+
+            file_path = os.path.join(directory, 'other.csv')
+            self._get_model().to_file(file_path)
+            loaded = GammaGamma.from_file(file_path, logger=getLogger())
+            self.assertIsNone(loaded.fit_diagnostics)
+
+    def test_from_file_other_model(self) -> None:
+        model = self._get_model()
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'draws')
+            model.to_file(file_path, file_format='npy')
+            with self.assertRaises(ValueError) as error:
+                ParetoNBD.from_file(file_path)
+
+        self.assertEqual(
+            str(error.exception),
+            f'Draws in "{file_path}" are of model "gamma_gamma", '
+            'not "pareto_nbd".'
+        )
+
+    def test_to_file_unknown_format(self) -> None:
+        with self.assertRaises(ValueError) as error:
+            self._get_model().to_file('draws', file_format='hdf5')
+        self.assertEqual(
+            str(error.exception),
+            'Unknown file format "hdf5".'
+        )
+
+    def test_prediction_cache(self) -> None:
+        data = pandas.DataFrame(
+            data={
+                'id': numpy.arange(6),
+                'frequency': [1, 2, 3, 1, 2, 3],
+                'value': [10.0, 20.0, 30.0, 10.0, 20.0, 30.0],
+            }
+        )
+        expected = self._get_model().predict(data)
+
+        model = self._get_model()
+        model.prediction_cache_size = 2
+        with patch.object(
+            model,
+            '_expected_value',
+            wraps=model._expected_value
+        ) as expected_value:
+            assert_frame_equal(model.predict(data), expected)
+            self.assertEqual(len(model._prediction_cache), 2)
+            # the two most recently used rows are cached
+            assert_frame_equal(
+                model.predict(data.iloc[1:3]),
+                expected.iloc[1:3]
+            )
+
+        computed_rows = [
+            len(call.args[0]) for call in expected_value.call_args_list
+        ]
+        self.assertEqual(computed_rows, [3])
+
+    def test_collapse_rows(self) -> None:
+        data = pandas.DataFrame(
+            data={
+                'id': [0, 1, 2, 3, 4],
+                'frequency': [2, 1, 2, 2, 1],
+                'recency': [3, 0, 3, 4, 0],
+                'T': [5, 5, 5, 5, 5],
+                'value': [10, 20, 30, 40, 50],
+            }
+        )
+        expected = pandas.DataFrame(
+            data={
+                'frequency': [2, 1, 2],
+                'recency': [3, 0, 4],
+                'T': [5, 5, 5],
+                'weight': [2.0, 2.0, 1.0],
+            }
+        )
+        assert_frame_equal(
+            collapse_rows(data, ['frequency', 'recency', 'T']),
+            expected
+        )
+
+    def test_fit_collapse_without_marginal_model(self) -> None:
+        model = GammaGamma(logger=getLogger())
+        with self.assertRaises(ValueError) as error:
+            model.fit(pandas.DataFrame(), collapse=True)
+        self.assertEqual(
+            str(error.exception),
+            'Model "gamma_gamma" has no marginal variant.'
+        )
+
+    def test_fit_unknown_method(self) -> None:
+        model = GammaGamma(logger=getLogger())
+        with self.assertRaises(ValueError) as error:
+            model.fit(pandas.DataFrame(), method='laplace')
+        self.assertEqual(
+            str(error.exception),
+            'Unknown fit method "laplace".'
+        )
+
+    def test_fit_marginal_without_marginal_model(self) -> None:
+        model = GammaGamma(logger=getLogger())
+        with self.assertRaises(ValueError) as error:
+            model.fit(pandas.DataFrame(), marginal=True)
+        self.assertEqual(
+            str(error.exception),
+            'Model "gamma_gamma" has no marginal variant.'
+        )
+
+    def test_collapse_rows_weighted(self) -> None:
+        data = pandas.DataFrame(
+            data={
+                'frequency': [2, 1, 2],
+                'recency': [3, 0, 3],
+                'T': [5, 5, 5],
+                'weight': [1.5, 2.0, 3.0],
+            }
+        )
+        expected = pandas.DataFrame(
+            data={
+                'frequency': [2, 1],
+                'recency': [3, 0],
+                'T': [5, 5],
+                'weight': [4.5, 2.0],
+            }
+        )
+        assert_frame_equal(
+            collapse_rows(data, ['frequency', 'recency', 'T']),
+            expected
+        )
+
+    def test_stratified_sample(self) -> None:
+        random_state = numpy.random.RandomState(1729)
+        data = pandas.DataFrame(
+            data={
+                'id': numpy.arange(10_000),
+                'frequency': random_state.poisson(3, size=10_000) + 1,
+                'T': random_state.randint(1, 365, size=10_000),
+            }
+        )
+        sample = stratified_sample(data, sample_size=500, seed=0)
+
+        self.assertEqual(len(sample), 500)
+        self.assertEqual(sample.id.nunique(), 500)
+        self.assertAlmostEqual(sample.weight.sum(), len(data))
+        self.assertAlmostEqual(
+            (sample.frequency * sample.weight).sum() / len(data),
+            data.frequency.mean(),
+            delta=0.05
+        )
+        assert_frame_equal(
+            stratified_sample(data, sample_size=500, seed=0),
+            sample
+        )
+        assert_frame_equal(
+            stratified_sample(data, sample_size=20_000),
+            data.assign(weight=1.0)
+        )
+
+    def test_stratified_sample_bad_size(self) -> None:
+        with self.assertRaises(ValueError) as error:
+            stratified_sample(pandas.DataFrame(), sample_size=0)
+        self.assertEqual(
+            str(error.exception),
+            'Sample size must be a positive integer.'
+        )
+
+    def test_warm_start_kwargs(self) -> None:
+        random_state = numpy.random.RandomState(1729)
+        previous = ParetoNBD(
+            **{
+                parameter: random_state.gamma(2, size=100)
+                for parameter in ParetoNBD.__parameters__
+            }
+        )
+        previous.fit_diagnostics = FitDiagnostics(
+            model_name='pareto_nbd_marginal',
+            method='sampling',
+            rows=100,
+            customers=100.0,
+            seconds={'sampling': 1.0},
+            stepsize=0.5,
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'draws')
+            previous.to_file(file_path, file_format='npy')
+            from_file = ParetoNBD()._warm_start_kwargs(
+                warm_start=file_path,
+                method='sampling',
+                model_name='pareto_nbd_marginal',
+                kwargs={'chains': 2, 'control': {'max_treedepth': 8}},
+            )
+
+        kwargs = ParetoNBD()._warm_start_kwargs(
+            warm_start=previous,
+            method='sampling',
+            model_name='pareto_nbd_marginal',
+            kwargs={'chains': 2, 'control': {'max_treedepth': 8}},
+        )
+        self.assertEqual(kwargs['chains'], 2)
+        self.assertEqual(
+            kwargs['init'],
+            [
+                {
+                    parameter: getattr(previous, parameter)[index]
+                    for parameter in ParetoNBD.__parameters__
+                }
+                for index in range(2)
+            ]
+        )
+        self.assertEqual(kwargs['control']['stepsize'], 0.5)
+        self.assertEqual(kwargs['control']['max_treedepth'], 8)
+        numpy.testing.assert_allclose(
+            kwargs['control']['inv_metric'],
+            [
+                numpy.log(getattr(previous, parameter)).var()
+                for parameter in ParetoNBD.__parameters__
+            ]
+        )
+
+        # the step size is saved with the draws, in the fit diagnostics
+        self.assertEqual(from_file['control']['stepsize'], 0.5)
+        self.assertEqual(from_file['init'], kwargs['init'])
+
+        kwargs = ParetoNBD()._warm_start_kwargs(
+            warm_start=previous,
+            method='sampling',
+            model_name='pareto_nbd',
+            kwargs={},
+        )
+        self.assertEqual(len(kwargs['init']), 4)
+        self.assertEqual(kwargs['control'], {})
+
+        kwargs = ParetoNBD()._warm_start_kwargs(
+            warm_start=previous,
+            method='optimizing',
+            model_name='pareto_nbd',
+            kwargs={},
+        )
+        self.assertEqual(
+            kwargs['init'],
+            {
+                parameter: getattr(previous, parameter).mean()
+                for parameter in ParetoNBD.__parameters__
+            }
+        )
+
+    def test_compress(self) -> None:
+        model = self._get_model()
+        compressed = model.compress(n_points=10, method='thin')
+        assert_array_equal(compressed.draw_weights, numpy.full(10, 0.1))
+        assert_array_equal(compressed.p, model.p[numpy.arange(0, 100, 11)])
+        self.assertIs(compressed.logger, model.logger)
+
+        data = pandas.DataFrame(
+            data={'id': [0, 1], 'frequency': [1, 5], 'value': [10, 20]}
+        )
+        frequency = numpy.array([[1], [5]])
+        value = numpy.array([[10], [20]])
+        numpy.testing.assert_allclose(
+            compressed.predict(data).value,
+            (
+                compressed.p
+                * (compressed.mu + frequency * value)
+                / (compressed.p * frequency + compressed.q - 1)
+            ).mean(axis=1).round(2)
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            for file_format, file_name in [('csv', 'draws.csv'),
+                                           ('npy', 'draws')]:
+                file_path = os.path.join(directory, file_name)
+                compressed.to_file(file_path, file_format=file_format)
+                loaded = GammaGamma.from_file(
+                    file_path,
+                    memory_map=False,
+                    logger=getLogger()
+                )
+                numpy.testing.assert_allclose(
+                    loaded.draw_weights,
+                    compressed.draw_weights
+                )
+
+        with self.assertRaises(ValueError) as error:
+            compressed.compress(n_points=5)
+        self.assertEqual(
+            str(error.exception),
+            'Draws are already compressed.'
+        )
+
+    def test_posterior_mean_weighted(self) -> None:
+        model = GammaGamma(
+            p=numpy.array([1.0, 3.0]),
+            q=numpy.array([2.0, 4.0]),
+            mu=numpy.array([1.0, 1.0]),
+            draw_weights=numpy.array([0.75, 0.25]),
+            logger=getLogger()
+        )
+        mean = model.posterior_mean()
+        assert_array_equal(mean.p, [1.5])
+        assert_array_equal(mean.q, [2.5])
+        self.assertIsNone(mean.draw_weights)
+
+    def test_posterior_average_no_rows(self) -> None:
+        model = self._get_model()
+        for draw_weights in [None, numpy.full(100, 0.01)]:
+            model.draw_weights = draw_weights
+            actual = model._posterior_average(numpy.empty((0, 100)))
+            self.assertEqual(actual.shape, (0,))
+
+    def test_copies_keep_fit_diagnostics(self) -> None:
+        model = self._get_model()
+        model.fit_diagnostics = FitDiagnostics(
+            model_name='gamma_gamma',
+            method='optimizing',
+            rows=10,
+            customers=10.0,
+            seconds={'optimizing': 1.0},
+        )
+        for copy in [model.compress(10, seed=0), model.posterior_mean()]:
+            self.assertIs(copy.fit_diagnostics, model.fit_diagnostics)
+
+        self.assertEqual(model, replace(model, fit_diagnostics=None))
+
+    def test_unique_rows(self) -> None:
+        frequency = numpy.array([2, 1, 2, 2], dtype=object)
+        recency = numpy.array([3.0, 1.0, 3.0, 4.0])
+        (unique_frequency, unique_recency), inverse = unique_rows(
+            frequency,
+            recency
+        )
+        assert_array_equal(unique_frequency, [2, 1, 2])
+        assert_array_equal(unique_recency, [3.0, 1.0, 4.0])
+        assert_array_equal(inverse, [0, 1, 0, 2])
+
+        unique_columns, inverse = unique_rows(
+            numpy.array([], dtype=object),
+            numpy.array([], dtype=object)
+        )
+        self.assertEqual([len(column) for column in unique_columns], [0, 0])
+        self.assertEqual(len(inverse), 0)
@@ -0,0 +1,88 @@
+import importlib.util
+import os
+import pickle
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from clv_model import stan_model_cache
+from clv_model.transactions_model import ParetoNBD
+
+# model hashes include the pystan version
+requires_pystan = unittest.skipIf(
+    importlib.util.find_spec('pystan') is None,
+    'pystan is not installed'
+)
+
+
+class TestStanModelCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.environment = patch.dict(
+            os.environ,
+            {stan_model_cache.CACHE_DIRECTORY_VARIABLE: self.directory.name}
+        )
+        self.environment.start()
+
+    def tearDown(self) -> None:
+        self.environment.stop()
+        self.directory.cleanup()
+
+    def test_stan_model_names(self) -> None:
+        self.assertEqual(
+            stan_model_cache.stan_model_names(),
+            [
+                'beta_geometric_nbd',
+                'beta_geometric_nbd_marginal',
+                'gamma_gamma',
+                'pareto_nbd',
+                'pareto_nbd_marginal',
+            ]
+        )
+
+    @requires_pystan
+    def test_cached_model_path(self) -> None:
+        path = stan_model_cache.cached_model_path('pareto_nbd')
+        self.assertEqual(os.path.dirname(path), self.directory.name)
+        self.assertEqual(
+            os.path.basename(path),
+            f'pareto_nbd-{stan_model_cache.stan_model_hash("pareto_nbd")}.pkl'
+        )
+        self.assertNotEqual(
+            stan_model_cache.stan_model_hash('pareto_nbd'),
+            stan_model_cache.stan_model_hash('beta_geometric_nbd')
+        )
+
+    @requires_pystan
+    def test_load_cached_stan_model(self) -> None:
+        self.assertFalse(stan_model_cache.is_cached('gamma_gamma'))
+        self.assertIsNone(
+            stan_model_cache.load_cached_stan_model('gamma_gamma')
+        )
+
+        with open(
+            stan_model_cache.cached_model_path('gamma_gamma'),
+            'wb'
+        ) as model_file:
+            pickle.dump('compiled model', model_file)
+
+        self.assertTrue(stan_model_cache.is_cached('gamma_gamma'))
+        self.assertEqual(
+            stan_model_cache.get_stan_model('gamma_gamma'),
+            'compiled model'
+        )
+
+    @requires_pystan
+    def test_stale_model(self) -> None:
+        with open(
+            stan_model_cache.cached_model_path('gamma_gamma'),
+            'wb'
+        ) as model_file:
+            pickle.dump('compiled model', model_file)
+
+        with patch('pystan.__version__', '0.0.0'):
+            self.assertFalse(stan_model_cache.is_cached('gamma_gamma'))
+
+    def test_lazy_loading(self) -> None:
+        self.assertIsNone(ParetoNBD._stan_model)
+        self.assertIsNone(ParetoNBD._marginal_stan_model)
@@ -0,0 +1,104 @@
+import unittest
+
+import numpy
+import pandas
+
+from clv_model.transactions_model import BetaGeometricNBD
+
+
+class TestBetaGeometricNBD(unittest.TestCase):
+    def setUp(self) -> None:
+        random_state = numpy.random.RandomState(1729)
+        self.draws = {
+            'lambda_shape': random_state.gamma(100, 0.01, size=1000),
+            'lambda_rate': random_state.gamma(100, 0.1, size=1000),
+            'alpha': random_state.gamma(100, 0.03, size=1000),
+            'beta': random_state.gamma(100, 0.1, size=1000),
+        }
+        T = random_state.randint(1, 365, size=500)
+        self.data = pandas.DataFrame(
+            data={
+                'id': numpy.arange(500),
+                'frequency': random_state.randint(1, 40, size=500),
+                'recency': numpy.floor(random_state.uniform(size=500) * T),
+                'T': T,
+            }
+        )
+
+    def test_predict(self) -> None:
+        # the example customer in section 5 of
+        # https://www.brucehardie.com/papers/bgnbd_2004-04-20.pdf
+        model = BetaGeometricNBD(
+            lambda_shape=numpy.array([0.243]),
+            lambda_rate=numpy.array([4.414]),
+            alpha=numpy.array([0.793]),
+            beta=numpy.array([2.426])
+        )
+        data = pandas.DataFrame(
+            data={
+                'id': [0],
+                'frequency': [2],
+                'recency': [30.43],
+                'T': [38.86],
+            }
+        )
+
+        self.assertAlmostEqual(
+            model.predict(data, periods=39).transactions[0],
+            1.226,
+            places=3
+        )
+
+    def test_probability_alive(self) -> None:
+        model = BetaGeometricNBD(**self.draws)
+        frequency = self.data.frequency.values.reshape(-1, 1)
+        recency = self.data.recency.values.reshape(-1, 1)
+        observation_period = self.data['T'].values.reshape(-1, 1)
+
+        expected = 1 / (
+            1
+            + self.draws['alpha'] / (self.draws['beta'] + frequency - 1)
+            * (
+                (self.draws['lambda_rate'] + observation_period)
+                / (self.draws['lambda_rate'] + recency)
+            ) ** (self.draws['lambda_shape'] + frequency)
+        )
+
+        numpy.testing.assert_allclose(
+            model.probability_alive(
+                frequency=frequency,
+                recency=recency,
+                observation_period=observation_period
+            ),
+            expected,
+            rtol=1e-12
+        )
+
+    def test_predict_chunked(self) -> None:
+        expected = BetaGeometricNBD(**self.draws).predict(
+            self.data,
+            periods=90
+        )
+        actual = BetaGeometricNBD(
+            **self.draws,
+            prediction_memory_limit=1
+        ).predict(self.data, periods=90)
+
+        pandas.testing.assert_frame_equal(actual, expected)
+
+    def test_predict_float32(self) -> None:
+        expected = BetaGeometricNBD(**self.draws).predict(
+            self.data,
+            periods=90
+        )
+        actual = BetaGeometricNBD(
+            **self.draws,
+            prediction_dtype=numpy.float32
+        ).predict(self.data, periods=90)
+
+        numpy.testing.assert_allclose(
+            actual.transactions,
+            expected.transactions,
+            rtol=1e-4,
+            atol=1e-5
+        )
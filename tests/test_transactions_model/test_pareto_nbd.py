@@ -0,0 +1,168 @@
+import unittest
+
+import numpy
+import pandas
+
+from clv_model.transactions_model import ParetoNBD
+from clv_model.transactions_model.pareto_nbd_numba import numba_available
+
+
+class TestParetoNBD(unittest.TestCase):
+    def setUp(self) -> None:
+        random_state = numpy.random.RandomState(1729)
+        self.draws = {
+            'lambda_shape': random_state.gamma(100, 0.01, size=1000),
+            'lambda_rate': random_state.gamma(100, 0.1, size=1000),
+            'mu_shape': random_state.gamma(100, 0.015, size=1000),
+            'mu_rate': random_state.gamma(100, 0.5, size=1000),
+        }
+        T = random_state.randint(1, 365, size=500)
+        self.data = pandas.DataFrame(
+            data={
+                'id': numpy.arange(500),
+                'frequency': random_state.randint(1, 40, size=500),
+                'recency': numpy.floor(random_state.uniform(size=500) * T),
+                'T': T,
+            }
+        )
+
+    def test_predict_chunked(self) -> None:
+        for dtype in [numpy.float64, numpy.float32]:
+            expected = ParetoNBD(
+                **self.draws,
+                prediction_dtype=dtype
+            ).predict(self.data, periods=90)
+            # chunks of 7 customers
+            actual = ParetoNBD(
+                **self.draws,
+                prediction_dtype=dtype,
+                prediction_memory_limit=7 * 16 * 1000 * 8
+            ).predict(self.data, periods=90)
+
+            pandas.testing.assert_frame_equal(actual, expected)
+
+    def test_predict_duplicate_rows(self) -> None:
+        model = ParetoNBD(**self.draws)
+        expected = model.predict(self.data, periods=90)
+        actual = model.predict(
+            pandas.concat([self.data, self.data], ignore_index=True),
+            periods=90
+        )
+
+        numpy.testing.assert_array_equal(
+            actual.transactions,
+            numpy.tile(expected.transactions, 2)
+        )
+
+    def test_probability_alive_duplicate_rows(self) -> None:
+        model = ParetoNBD(**self.draws)
+        arguments = {
+            'frequency': numpy.array([[1], [5], [1], [5]]),
+            'recency': numpy.array([[10], [50], [10], [50]]),
+            'observation_period': numpy.array([[100], [100], [100], [100]]),
+        }
+
+        numpy.testing.assert_array_equal(
+            model.probability_alive(**arguments),
+            model._probability_alive(**arguments)
+        )
+
+    @unittest.skipUnless(numba_available(), 'requires numba')
+    def test_predict_numba(self) -> None:
+        for model in [
+            ParetoNBD(**self.draws),
+            ParetoNBD(**self.draws).compress(20, method='quantile'),
+        ]:
+            model.prediction_backend = 'numpy'
+            expected = model.predict(self.data, periods=90)
+            # the default picks numba, as it is installed
+            for backend in ['numba', 'auto']:
+                model.prediction_backend = backend
+                actual = model.predict(self.data, periods=90)
+
+                # the tolerance stated in ParetoNBD.predict
+                pandas.testing.assert_frame_equal(
+                    actual,
+                    expected,
+                    check_exact=False,
+                    rtol=1e-9
+                )
+
+    @unittest.skipUnless(numba_available(), 'requires numba')
+    def test_predict_numba_not_converged(self) -> None:
+        # a rate close to zero puts the 2F1 argument at recency 0 so
+        # close to 1 that the series needs far more terms than allowed
+        model = ParetoNBD(
+            lambda_shape=numpy.array([1.0]),
+            lambda_rate=numpy.array([1e-12]),
+            mu_shape=numpy.array([2.0]),
+            mu_rate=numpy.array([1.0]),
+            prediction_backend='numba'
+        )
+        data = pandas.DataFrame(
+            data={
+                'id': [0, 1],
+                'frequency': [1, 1],
+                'recency': [0, 5],
+                'T': [10, 10],
+            }
+        )
+        transactions = model.predict(data, periods=90).transactions
+
+        self.assertTrue(numpy.isnan(transactions[0]))
+        self.assertTrue(numpy.isfinite(transactions[1]))
+
+    def test_unknown_prediction_backend(self) -> None:
+        with self.assertRaises(ValueError) as error:
+            ParetoNBD(**self.draws, prediction_backend='cuda')
+        self.assertEqual(
+            str(error.exception),
+            'Unknown prediction backend "cuda".'
+        )
+
+    def test_predict_float32(self) -> None:
+        for lambda_rate in [self.draws['lambda_rate'], 200]:
+            draws = {**self.draws, 'lambda_rate': lambda_rate}
+            expected = ParetoNBD(**draws).predict(self.data, periods=90)
+            actual = ParetoNBD(
+                **draws,
+                prediction_dtype=numpy.float32
+            ).predict(self.data, periods=90)
+
+            numpy.testing.assert_array_equal(actual.id, expected.id)
+            self.assertEqual(actual.transactions.dtype, numpy.float64)
+            numpy.testing.assert_allclose(
+                actual.transactions,
+                expected.transactions,
+                rtol=1e-4,
+                atol=1e-5
+            )
+
+    def test_probability_alive_float32(self) -> None:
+        arguments = {
+            'frequency': self.data.frequency.values.reshape(-1, 1),
+            'recency': self.data.recency.values.reshape(-1, 1),
+            'observation_period': self.data['T'].values.reshape(-1, 1),
+        }
+        expected = ParetoNBD(**self.draws).probability_alive(**arguments)
+        actual = ParetoNBD(
+            **self.draws,
+            prediction_dtype=numpy.float32
+        ).probability_alive(**arguments)
+
+        self.assertEqual(actual.dtype, numpy.float32)
+        numpy.testing.assert_allclose(actual, expected, atol=1e-4)
+
+    def test_probability_alive_float32_many_transactions(self) -> None:
+        # the float64 path overflows here
+        actual = ParetoNBD(
+            **self.draws,
+            prediction_dtype=numpy.float32
+        ).probability_alive(
+            frequency=numpy.array([[500], [500]]),
+            recency=numpy.array([[364], [100]]),
+            observation_period=numpy.array([[364], [364]]),
+        )
+
+        numpy.testing.assert_array_equal(actual[0], 1)
+        self.assertTrue(((actual[1] >= 0) & (actual[1] < 1e-6)).all())
@@ -38,6 +38,85 @@ class TestGammaGamma(unittest.TestCase):
 
         assert_frame_equal(actual, expected)
 
+    def test_predict_compact(self) -> None:
+        model = self._get_model()
+        data = pandas.DataFrame(
+            data={
+                'id': pandas.Categorical(['a', 'b']),
+                'frequency': numpy.array([9, 4], dtype=numpy.int8),
+                'value': numpy.array([1, 6], dtype=numpy.float32)
+            }
+        )
+        actual = model.predict(data)
+        expected = pandas.DataFrame(
+            data={
+                'id': pandas.Categorical(['a', 'b']),
+                'value': [1.39, 5.44]
+            }
+        )
+
+        assert_frame_equal(actual, expected)
+
+    def test_predict_chunked(self) -> None:
+        random_state = numpy.random.RandomState(1729)
+        data = pandas.DataFrame(
+            data={
+                'id': numpy.arange(100),
+                'frequency': random_state.randint(1, 20, size=100),
+                'value': random_state.gamma(2, 10, size=100)
+            }
+        )
+        model = GammaGamma(
+            p=random_state.gamma(100, 0.05, size=500),
+            q=random_state.gamma(100, 0.05, size=500),
+            mu=random_state.gamma(100, 0.1, size=500),
+            logger=getLogger()
+        )
+        expected = model.predict(data)
+        model.prediction_memory_limit = 1
+
+        assert_frame_equal(model.predict(data), expected)
+
+    def test_predict_float32(self) -> None:
+        random_state = numpy.random.RandomState(1729)
+        draws = {
+            'p': random_state.gamma(60, 0.1, size=1000),
+            'q': random_state.gamma(40, 0.1, size=1000),
+            'mu': random_state.gamma(150, 0.1, size=1000),
+        }
+        data = pandas.DataFrame(
+            data={
+                'id': numpy.arange(500),
+                'frequency': random_state.randint(1, 100, size=500),
+                'value': random_state.gamma(2, 20, size=500).round(2),
+            }
+        )
+        expected = GammaGamma(**draws, logger=getLogger()).predict(data)
+        actual = GammaGamma(
+            **draws,
+            logger=getLogger(),
+            prediction_dtype=numpy.float32
+        ).predict(data)
+
+        # equal up to rounding to cents
+        assert_frame_equal(actual, expected, check_exact=False, atol=0.01)
+
+    def test_unknown_prediction_dtype(self) -> None:
+        with self.assertRaises(ValueError) as error:
+            GammaGamma(logger=getLogger(), prediction_dtype=numpy.float16)
+        self.assertEqual(
+            str(error.exception),
+            f'Unknown prediction dtype "{numpy.float16}".'
+        )
+
+    def test_invalid_prediction_memory_limit(self) -> None:
+        with self.assertRaises(ValueError) as error:
+            GammaGamma(logger=getLogger(), prediction_memory_limit=0)
+        self.assertEqual(
+            str(error.exception),
+            'Prediction memory limit must be a positive integer.'
+        )
+
     def test_predict_empty(self) -> None:
         model = self._get_model()
         data = pandas.DataFrame(columns={'id', 'frequency', 'value'})